@@ -7,9 +7,17 @@ import retrofit2.http.*
 data class TokenReq(val username: String, val password: String)
 data class TokenRes(val access: String, val refresh: String?)
 
-data class ClockReq(val latitude: Double, val longitude: Double, val type: String?, val work_location_id: Int?)
+data class ClockReq(val latitude: Double, val longitude: Double, val type: String?, val work_location_id: Int?, val client_id: String? = null)
 data class ClockRes(val ok: Boolean, val within_geofence: Boolean, val distance_m: Double, val type: String, val timestamp: String)
 
+data class PunchReq(val client_id: String, val timestamp: String, val latitude: Double, val longitude: Double, val type: String?, val work_location_id: Int?)
+data class ClockBatchReq(val punches: List<PunchReq>)
+data class PunchResult(
+    val client_id: String?, val ok: Boolean, val duplicate: Boolean?, val type: String?,
+    val timestamp: String?, val within_geofence: Boolean?, val distance_m: Double?, val message: String?
+)
+data class ClockBatchRes(val ok: Boolean, val accepted: Int, val results: List<PunchResult>)
+
 data class WorkLocation(val id: Int, val name: String, val latitude: Double, val longitude: Double, val radius_m: Int)
 data class Shift(val id: Int, val name: String, val start_time: String, val end_time: String)
 data class EmployeeMe(
@@ -42,6 +50,9 @@ interface ApiService {
     @POST("api/clock/")
     fun clock(@Body req: ClockReq): Call<ClockRes>
 
+    @POST("api/clock/batch/")
+    fun clockBatch(@Body req: ClockBatchReq): Call<ClockBatchRes>
+
     @GET("api/employee/me/")
     fun me(): Call<EmployeeMe>
 
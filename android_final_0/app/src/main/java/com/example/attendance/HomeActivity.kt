@@ -92,7 +92,9 @@ class HomeActivity : AppCompatActivity() {
                 return@addOnSuccessListener
             }
             val api = RetrofitClient.retrofit(this).create(ApiService::class.java)
-            val req = ClockReq(latitude = loc.latitude, longitude = loc.longitude, type = null, work_location_id = selectedWorkLocationId)
+            // client_id cố định cho lần bấm này: OkHttp gửi lại sau timeout sẽ không tạo bản ghi trùng
+            val req = ClockReq(latitude = loc.latitude, longitude = loc.longitude, type = null, work_location_id = selectedWorkLocationId,
+                client_id = java.util.UUID.randomUUID().toString())
             api.clock(req).enqueue(object: Callback<ClockRes> {
                 override fun onResponse(call: Call<ClockRes>, response: Response<ClockRes>) {
                     if (response.isSuccessful) {
@@ -2,11 +2,13 @@
 package com.example.attendance
 
 import android.content.Context
+import okhttp3.Cache
 import okhttp3.Interceptor
 import okhttp3.OkHttpClient
 import okhttp3.Response
 import retrofit2.Retrofit
 import retrofit2.converter.gson.GsonConverterFactory
+import java.io.File
 
 class AuthInterceptor(private val context: Context) : Interceptor {
     override fun intercept(chain: Interceptor.Chain): Response {
@@ -19,10 +21,18 @@ class AuthInterceptor(private val context: Context) : Interceptor {
 }
 
 object RetrofitClient {
+    // Lịch sử chấm công trả ETag/Last-Modified: OkHttp gửi lại If-None-Match và dùng bản lưu khi server trả 304
+    private var httpCache: Cache? = null
+
+    private fun cache(context: Context): Cache = synchronized(this) {
+        httpCache ?: Cache(File(context.applicationContext.cacheDir, "http"), 5L * 1024 * 1024).also { httpCache = it }
+    }
+
     fun retrofit(context: Context): Retrofit {
         val base = if (Config.BASE_URL.endsWith("/")) Config.BASE_URL else Config.BASE_URL + "/"
         val client = OkHttpClient.Builder()
             .addInterceptor(AuthInterceptor(context))
+            .cache(cache(context))
             .build()
         return Retrofit.Builder()
             .baseUrl(base)
@@ -1,6 +1,8 @@
 
 from django.contrib import admin
-from .models import Department, Position, Role, WorkLocation, Shift, Employee, Attendance, AttendanceChangeLog
+from .models import Department, Position, Role, WorkLocation, Shift, Employee, Attendance, AttendanceChangeLog, ArchivedMonth, PayrollSnapshot, ShiftAssignment, ScheduledShift
+from .caching import invalidate_clock_state
+from .summary import refresh_daily_summary
 
 admin.site.register([Department, Position, Role, WorkLocation, Shift])
 
@@ -15,6 +17,50 @@ class AttendanceAdmin(admin.ModelAdmin):
     search_fields = ("employee__user__username",)
     list_filter = ("type","within_geofence","work_location")
 
+    # thêm/sửa/xóa trong admin cũng phải cập nhật bảng tổng hợp (như web_attendance_new/edit)
+    def _refresh(self, days):
+        employees = Employee.objects.in_bulk({emp_id for emp_id, _ in days if emp_id})
+        for emp_id, day in days:
+            if emp_id in employees:
+                invalidate_clock_state(emp_id)
+                refresh_daily_summary(employees[emp_id], day)
+
+    def save_model(self, request, obj, form, change):
+        before = set(Attendance.objects.filter(pk=obj.pk).values_list("employee_id", "work_date")) if change else set()
+        super().save_model(request, obj, form, change)
+        self._refresh(before | {(obj.employee_id, obj.work_date)})
+
+    def delete_model(self, request, obj):
+        days = {(obj.employee_id, obj.work_date)}
+        super().delete_model(request, obj)
+        self._refresh(days)
+
+    def delete_queryset(self, request, queryset):
+        days = set(queryset.values_list("employee_id", "work_date"))
+        super().delete_queryset(request, queryset)
+        self._refresh(days)
+
 @admin.register(AttendanceChangeLog)
 class AttendanceChangeLogAdmin(admin.ModelAdmin):
     list_display = ("id","attendance","action","changed_by","changed_at")
+
+@admin.register(ArchivedMonth)
+class ArchivedMonthAdmin(admin.ModelAdmin):
+    list_display = ("month","row_count","changelog_count","size_bytes","path","archived_at")
+
+@admin.register(PayrollSnapshot)
+class PayrollSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("month","row_count","content_hash","computed_at")
+    exclude = ("rows",)
+
+@admin.register(ShiftAssignment)
+class ShiftAssignmentAdmin(admin.ModelAdmin):
+    list_display = ("employee","shift","rotation","start_date","end_date","updated_at")
+    search_fields = ("employee__user__username",)
+    raw_id_fields = ("employee",)
+
+@admin.register(ScheduledShift)
+class ScheduledShiftAdmin(admin.ModelAdmin):
+    list_display = ("employee","work_date","shift","start_at","end_at")
+    search_fields = ("employee__user__username",)
+    list_filter = ("shift",)
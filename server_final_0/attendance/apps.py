@@ -1,5 +1,7 @@
-
 from django.apps import AppConfig
 
 class AttendanceConfig(AppConfig):
     name = "attendance"
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
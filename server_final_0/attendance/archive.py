@@ -0,0 +1,430 @@
+# Lưu trữ lạnh các tháng chấm công đã đóng.
+#
+# Mỗi tháng là một file cột trong ATTENDANCE_ARCHIVE_DIR/YYYY-MM/attendance.<checksum>.arc: các dòng được sắp
+# theo (employee_id, timestamp, type, id) rồi chia thành nhóm ARCHIVE_GROUP_ROWS dòng; trong mỗi nhóm,
+# mỗi cột được nén zlib thành một khối riêng. Phần cuối file là header JSON (vị trí các khối, khoảng
+# dòng của từng nhân viên), nên reader mmap file và chỉ giải nén các khối cột cần cho nhân viên được hỏi.
+# AttendanceChangeLog của tháng nằm cạnh trong changelog.<checksum>.jsonl.gz.
+#
+# Bảng ArchivedMonth là chỉ mục; DailyWorkSummary của các tháng đã lưu trữ vẫn ở trong DB.
+import glob
+import gzip
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import struct
+import threading
+import uuid
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Attendance, AttendanceChangeLog, ArchivedMonth
+from .caching import bump_monitor_version
+from .utils import local_work_date, month_bounds
+
+MAGIC = b"ATTARC01"
+ARCHIVE_GROUP_ROWS = 8192
+ARCHIVE_FILE = "attendance.arc"
+DELETE_CHUNK = 500
+
+NULL = -(2 ** 63)  # giá trị rỗng cho cột số nguyên
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICRO = timedelta(microseconds=1)
+_NO_UUID = bytes(16)
+_TYPES = ("IN", "OUT")
+
+
+def _ts_enc(dt):
+    return NULL if dt is None else (dt - _EPOCH) // _MICRO
+
+
+def _ts_dec(v):
+    return None if v == NULL else _EPOCH + timedelta(microseconds=v)
+
+
+def _int_enc(v):
+    return NULL if v is None else int(v)
+
+
+def _int_dec(v):
+    return None if v == NULL else v
+
+
+# (tên cột, kiểu lưu, mã hóa, giải mã); kiểu lưu là typecode của array, "uuid" hoặc "json"
+COLUMNS = (
+    ("id", "q", int, int),
+    ("employee_id", "q", _int_enc, _int_dec),
+    ("timestamp", "q", _ts_enc, _ts_dec),
+    ("type", "b", _TYPES.index, _TYPES.__getitem__),
+    ("latitude", "d", float, float),
+    ("longitude", "d", float, float),
+    ("distance_m", "d", float, float),
+    ("within_geofence", "b", int, bool),
+    ("work_location_id", "q", int, int),
+    ("created_by_id", "q", _int_enc, _int_dec),
+    ("changed_by_id", "q", _int_enc, _int_dec),
+    ("changed_at", "q", _ts_enc, _ts_dec),
+    ("client_id", "uuid", None, None),
+    ("note", "json", None, None),
+)
+COLUMN_NAMES = tuple(c[0] for c in COLUMNS)
+_SPEC = {c[0]: c[1:] for c in COLUMNS}
+# thứ tự dòng trong file; cùng thứ tự với PUNCH_ORDERING trong timecalc
+ROW_ORDERING = (F("employee_id").asc(nulls_first=True), "timestamp", "type", "id")
+
+
+def _sort_key(row):
+    return (NULL if row["employee_id"] is None else row["employee_id"], row["timestamp"], row["type"], row["id"])
+
+
+def _encode_column(name, values):
+    kind, enc, _ = _SPEC[name]
+    if kind == "uuid":
+        raw = b"".join(v.bytes if v else _NO_UUID for v in values)
+    elif kind == "json":
+        raw = json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode()
+    else:
+        raw = array(kind, map(enc, values)).tobytes()
+    return zlib.compress(raw, 6)
+
+
+def _decode_column(name, data):
+    kind, _, dec = _SPEC[name]
+    raw = zlib.decompress(data)
+    if kind == "uuid":
+        return [None if raw[i:i + 16] == _NO_UUID else uuid.UUID(bytes=raw[i:i + 16]) for i in range(0, len(raw), 16)]
+    if kind == "json":
+        return json.loads(raw)
+    values = array(kind)
+    values.frombytes(raw)
+    return [dec(v) for v in values]
+
+
+def month_dir(month):
+    return os.path.join(settings.ATTENDANCE_ARCHIVE_DIR, f"{month:%Y-%m}")
+
+
+def file_checksum(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_month_file(path, month, rows):
+    """Ghi các dòng (dict theo COLUMN_NAMES, đã sắp theo _sort_key) thành file cột. Trả về số dòng."""
+    groups, employees = [], {}
+    total = 0
+    with open(path, "wb") as f:
+        def flush(batch):
+            meta = {"start": total - len(batch), "rows": len(batch), "columns": {}}
+            for name in COLUMN_NAMES:
+                block = _encode_column(name, [r[name] for r in batch])
+                meta["columns"][name] = [f.tell(), len(block)]
+                f.write(block)
+            groups.append(meta)
+
+        batch = []
+        for row in rows:
+            emp = row["employee_id"]
+            if emp is not None:
+                employees.setdefault(str(emp), [total, total])[1] = total + 1
+            batch.append(row)
+            total += 1
+            if len(batch) == ARCHIVE_GROUP_ROWS:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        header = json.dumps({
+            "version": 1, "month": f"{month:%Y-%m}", "rows": total,
+            "groups": groups, "employees": employees,
+        }, separators=(",", ":")).encode()
+        f.write(header)
+        f.write(struct.pack("<Q", len(header)) + MAGIC)
+        f.flush()
+        os.fsync(f.fileno())
+    return total
+
+
+class MonthArchive:
+    """Đọc file cột của một tháng qua mmap; chỉ giải nén các khối cần dùng."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < 16 or self._mm[-8:] != MAGIC:
+            raise ValueError(f"Không phải file lưu trữ chấm công: {path}")
+        (size,) = struct.unpack("<Q", self._mm[-16:-8])
+        self.header = json.loads(self._mm[len(self._mm) - 16 - size:len(self._mm) - 16])
+        self.row_count = self.header["rows"]
+
+    def _block(self, group, name):
+        offset, length = group["columns"][name]
+        return _decode_column(name, self._mm[offset:offset + length])
+
+    def iter_columns(self, names, employee_id=None):
+        """Sinh các bộ giá trị theo `names` cho mọi dòng (hoặc chỉ các dòng của employee_id), theo thứ tự file."""
+        if employee_id is None:
+            lo, hi = 0, self.row_count
+        else:
+            span = self.header["employees"].get(str(employee_id))
+            if span is None:
+                return
+            lo, hi = span
+        for group in self.header["groups"]:
+            start, end = group["start"], group["start"] + group["rows"]
+            if end <= lo or start >= hi:
+                continue
+            a, b = max(lo, start) - start, min(hi, end) - start
+            cols = [self._block(group, n)[a:b] for n in names]
+            yield from zip(*cols)
+
+    def iter_rows(self, employee_id=None):
+        for values in self.iter_columns(COLUMN_NAMES, employee_id):
+            yield dict(zip(COLUMN_NAMES, values))
+
+    def close(self):
+        self._mm.close()
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def open_month(entry):
+    """MonthArchive của một dòng ArchivedMonth; dùng lại mmap đã mở nếu file chưa đổi."""
+    path = os.path.join(settings.ATTENDANCE_ARCHIVE_DIR, entry.path)
+    with _readers_lock:
+        reader = _readers.get(path)
+        if reader is None or reader[0] != entry.checksum:
+            if reader is not None:
+                # file đã được ghi lại: đóng mmap cũ trước khi mở file mới
+                _readers.pop(path)[1].close()
+            reader = _readers[path] = (entry.checksum, MonthArchive(path))
+        return reader[1]
+
+
+# ---------------- Chỉ mục -----------------
+
+ARCHIVE_INDEX_KEY = "archived-months"
+# chặn trên độ cũ của chỉ mục nếu lần xóa cache bị lỡ (ghi ArchivedMonth bằng SQL, cache bị xóa trắng...)
+ARCHIVE_INDEX_TTL = 300
+
+
+def archived_month_index():
+    """{ngày đầu tháng: ArchivedMonth}, cache đến khi chỉ mục thay đổi (signals.py) hoặc quá ARCHIVE_INDEX_TTL."""
+    index = cache.get(ARCHIVE_INDEX_KEY)
+    if index is None:
+        index = {m.month: m for m in ArchivedMonth.objects.all()}
+        cache.set(ARCHIVE_INDEX_KEY, index, ARCHIVE_INDEX_TTL)
+    return index
+
+
+def invalidate_archive_index():
+    cache.delete(ARCHIVE_INDEX_KEY)
+    if connection.in_atomic_block:
+        # request đọc giữa lúc xóa và commit (archive_month xóa dòng nóng trong cùng transaction) sẽ lưu lại chỉ mục cũ
+        transaction.on_commit(lambda: cache.delete(ARCHIVE_INDEX_KEY))
+
+
+def archived_months(start, end):
+    """Các ArchivedMonth giao với khoảng ngày [start, end]."""
+    first = start.replace(day=1)
+    return [m for month, m in sorted(archived_month_index().items()) if first <= month <= end]
+
+
+def archived_punches(start, end, employee_ids=None):
+    """Luồng (employee_id, timestamp, type) từ các tháng lưu trữ trong [start, end], theo PUNCH_ORDERING."""
+    streams = []
+    for entry in archived_months(start, end):
+        reader = open_month(entry)
+        if employee_ids:
+            parts = [reader.iter_columns(("employee_id", "timestamp", "type"), e) for e in sorted(employee_ids)]
+        else:
+            parts = [reader.iter_columns(("employee_id", "timestamp", "type"))]
+        for part in parts:
+            streams.append(r for r in part if r[0] is not None and start <= local_work_date(r[1]) <= end)
+    return heapq.merge(*streams, key=lambda r: (r[0], r[1], r[2]))
+
+
+def archived_attendances(employee_id, start, end):
+    """Các Attendance (không lưu trong DB) của một nhân viên từ file lưu trữ trong [start, end]."""
+    items = []
+    for entry in archived_months(start, end):
+        for row in open_month(entry).iter_rows(employee_id):
+            day = local_work_date(row["timestamp"])
+            if start <= day <= end:
+                items.append(Attendance(work_date=day, **row))
+    return items
+
+
+# ---------------- Chuyển tháng sang lưu trữ -----------------
+
+def closed_months(keep_months):
+    """Các tháng còn dữ liệu trong bảng chính và nằm ngoài `keep_months` tháng gần nhất."""
+    cutoff = timezone.localdate().replace(day=1)
+    for _ in range(max(keep_months, 1) - 1):
+        cutoff = (cutoff - timedelta(days=1)).replace(day=1)
+    return list(Attendance.objects.filter(work_date__lt=cutoff).dates("work_date", "month"))
+
+
+def delete_by_ids(model, column, ids):
+    # xóa thẳng bằng SQL: Collector sẽ nạp từng dòng và phát post_delete cho mỗi punch
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        for i in range(0, len(ids), DELETE_CHUNK):
+            chunk = ids[i:i + DELETE_CHUNK]
+            cursor.execute(f"DELETE FROM {table} WHERE {connection.ops.quote_name(column)} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def changelog_path(archive_path):
+    directory, name = os.path.split(archive_path)
+    return os.path.join(directory, name.replace("attendance.", "changelog.", 1)[:-len(".arc")] + ".jsonl.gz")
+
+
+def archive_month(month):
+    """Chuyển punch + log của một tháng từ DB sang file lưu trữ (gộp với file cũ nếu tháng đã lưu trữ).
+
+    File mới mang tên theo checksum và chỉ được trỏ tới trong cùng transaction xóa dòng khỏi DB,
+    nên nếu có lỗi giữa chừng thì dữ liệu vẫn nằm nguyên ở bảng chính hoặc file cũ.
+    """
+    start, end = month_bounds(month)
+    entry = ArchivedMonth.objects.filter(month=start).first()
+    hot = Attendance.objects.filter(work_date__gte=start, work_date__lte=end)
+    if not hot.exists():
+        return entry
+
+    directory = month_dir(start)
+    os.makedirs(directory, exist_ok=True)
+    tmp = os.path.join(directory, f"{ARCHIVE_FILE}.tmp")
+
+    hot_ids = []
+
+    def hot_rows():
+        for row in hot.order_by(*ROW_ORDERING).values(*COLUMN_NAMES).iterator(chunk_size=2000):
+            hot_ids.append(row["id"])
+            yield row
+
+    rows = hot_rows()
+    old_path = os.path.join(settings.ATTENDANCE_ARCHIVE_DIR, entry.path) if entry else None
+    if entry:
+        rows = heapq.merge(open_month(entry).iter_rows(), rows, key=_sort_key)
+    count = write_month_file(tmp, start, rows)
+    expected = (entry.row_count if entry else 0) + len(hot_ids)
+    check = MonthArchive(tmp)
+    check.close()
+    if check.row_count != count or count != expected:
+        os.remove(tmp)
+        raise RuntimeError(f"Số dòng lưu trữ tháng {start:%Y-%m} không khớp ({count} != {expected})")
+
+    checksum = file_checksum(tmp)
+    path = os.path.join(directory, f"attendance.{checksum[:12]}.arc")
+    os.replace(tmp, path)
+
+    # log của punch vừa chuyển, nối sau log của file cũ
+    logs = []
+    if old_path and os.path.exists(changelog_path(old_path)):
+        with gzip.open(changelog_path(old_path), "rt", encoding="utf-8") as f:
+            logs = [json.loads(line) for line in f]
+    for i in range(0, len(hot_ids), DELETE_CHUNK):
+        logs.extend(AttendanceChangeLog.objects.filter(attendance_id__in=hot_ids[i:i + DELETE_CHUNK]).order_by("id").values())
+    with gzip.open(changelog_path(path), "wt", encoding="utf-8") as f:
+        for log in logs:
+            f.write(json.dumps(log, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n")
+
+    try:
+        with transaction.atomic():
+            entry, _ = ArchivedMonth.objects.update_or_create(month=start, defaults={
+                "path": os.path.relpath(path, settings.ATTENDANCE_ARCHIVE_DIR), "row_count": count,
+                "changelog_count": len(logs), "size_bytes": os.path.getsize(path), "checksum": checksum,
+            })
+            delete_by_ids(AttendanceChangeLog, "attendance_id", hot_ids)
+            delete_by_ids(Attendance, "id", hot_ids)
+    except Exception:
+        if path != old_path:
+            os.remove(path)
+            os.remove(changelog_path(path))
+        raise
+    if old_path and old_path != path:
+        for p in (old_path, changelog_path(old_path)):
+            if os.path.exists(p):
+                os.remove(p)
+    bump_monitor_version()
+    return entry
+
+
+# ---------------- Kiểm tra / dựng lại chỉ mục -----------------
+
+def verify_month(entry):
+    """Danh sách vấn đề của một tháng lưu trữ (rỗng nếu file khớp chỉ mục)."""
+    problems = []
+    path = os.path.join(settings.ATTENDANCE_ARCHIVE_DIR, entry.path)
+    if not os.path.exists(path):
+        return [f"thiếu file {entry.path}"]
+    if file_checksum(path) != entry.checksum:
+        problems.append("checksum không khớp")
+    reader = MonthArchive(path)
+    try:
+        if reader.row_count != entry.row_count:
+            problems.append(f"số dòng {reader.row_count} != {entry.row_count} trong chỉ mục")
+        counted = sum(1 for _ in reader.iter_columns(("id",)))
+        if counted != reader.row_count:
+            problems.append(f"đọc được {counted}/{reader.row_count} dòng")
+    finally:
+        reader.close()
+    return problems
+
+
+def scan_archive_dir():
+    """Đọc header các file lưu trữ trên đĩa: [(ngày đầu tháng, đường dẫn tương đối, header)]."""
+    root = settings.ATTENDANCE_ARCHIVE_DIR
+    found = []
+    if not os.path.isdir(root):
+        return found
+    for name in sorted(os.listdir(root)):
+        # nếu còn sót file cũ (dừng giữa lúc gộp tháng) thì lấy file mới nhất
+        files = sorted(glob.glob(os.path.join(root, name, "attendance.*.arc")), key=os.path.getmtime)
+        if files:
+            path = files[-1]
+            reader = MonthArchive(path)
+            header = reader.header
+            reader.close()
+            month = datetime.strptime(header["month"], "%Y-%m").date()
+            found.append((month, os.path.relpath(path, root), header))
+    return found
+
+
+def _count_lines(path):
+    if not os.path.exists(path):
+        return 0
+    with gzip.open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def rebuild_index():
+    """Dựng lại bảng ArchivedMonth từ các file trên đĩa. Trả về (số tháng, [tháng thiếu file])."""
+    found = scan_archive_dir()
+    months = {m for m, _, _ in found}
+    missing = list(ArchivedMonth.objects.exclude(month__in=months).values_list("month", flat=True))
+    with transaction.atomic():
+        ArchivedMonth.objects.exclude(month__in=months).delete()
+        for month, rel, header in found:
+            path = os.path.join(settings.ATTENDANCE_ARCHIVE_DIR, rel)
+            ArchivedMonth.objects.update_or_create(month=month, defaults={
+                "path": rel, "row_count": header["rows"], "changelog_count": _count_lines(changelog_path(path)),
+                "size_bytes": os.path.getsize(path), "checksum": file_checksum(path),
+            })
+    return len(found), missing
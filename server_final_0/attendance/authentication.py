@@ -0,0 +1,70 @@
+import time
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .caching import get_clocking_context, claims_stale_since
+
+# mốc phát hành claims (epoch giây); cũ hơn claims_stale_since() thì không tin claims nữa
+CLAIMS_ISSUED_CLAIM = "claims_at"
+
+
+def employee_claims(user):
+    """Claims nhân viên nhúng vào JWT: employee_id, role, shift_id, location_ids, is_active..."""
+    ctx = get_clocking_context(user.pk)
+    shift = ctx["shift"]
+    return {
+        "username": user.get_username(),
+        "is_staff": user.is_staff,
+        "is_superuser": user.is_superuser,
+        "employee_id": ctx["employee_id"],
+        "employee_active": ctx["is_active"],
+        "role": ctx["role"],
+        "shift_id": shift.id if shift else None,
+        "location_ids": ctx["allowed_location_ids"],
+    }
+
+
+def apply_employee_claims(token, user):
+    for claim, value in employee_claims(user).items():
+        token[claim] = value
+    token[CLAIMS_ISSUED_CLAIM] = time.time()
+    return token
+
+
+class EmployeeTokenUser(TokenUser):
+    """User không trạng thái dựng từ claims của token, không đọc DB."""
+
+    @cached_property
+    def employee_id(self):
+        return self.token.get("employee_id")
+
+    @cached_property
+    def role_name(self):
+        return self.token.get("role")
+
+    @cached_property
+    def shift_id(self):
+        return self.token.get("shift_id")
+
+    @cached_property
+    def allowed_location_ids(self):
+        return self.token.get("location_ids") or []
+
+
+class EmployeeClaimsAuthentication(JWTAuthentication):
+    """JWTAuthentication không truy vấn User khi token mang claims nhân viên.
+
+    Khi HR đổi một trường có trong claims (signals.py), token phát hành trước đó không dùng claims nữa
+    mà đọc User từ DB như JWTAuthentication (vai trò, ca, địa điểm lấy từ clocking context) cho tới khi
+    client refresh. Token cũ không có claims cũng đi đường này.
+    """
+
+    def get_user(self, validated_token):
+        if CLAIMS_ISSUED_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        stale_since = claims_stale_since(validated_token.get(api_settings.USER_ID_CLAIM))
+        if stale_since is not None and validated_token[CLAIMS_ISSUED_CLAIM] < stale_since:
+            return super().get_user(validated_token)
+        return EmployeeTokenUser(validated_token)
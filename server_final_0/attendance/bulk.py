@@ -0,0 +1,132 @@
+# Thao tác hàng loạt trên nhân viên (trang Nhân viên → "Thao tác hàng loạt").
+#
+# Đổi ca/vai trò/trạng thái bằng một câu UPDATE và đổi địa điểm được phép bằng các câu ghi
+# theo tập trên bảng nối; update()/bulk_create không phát signal nên tự gọi employees_changed/schedule_changed.
+# Reset mật khẩu chạy nền, băm PBKDF2 song song (hashlib nhả GIL) và báo tiến độ qua cache.
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction, close_old_connections
+from django.utils import timezone
+
+from .models import Employee, Role, Shift, WorkLocation
+from .signals import employees_changed, schedule_changed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PASSWORD = "12345678"
+RESET_CHUNK_SIZE = 200
+RESET_HASH_WORKERS = 4
+JOB_TTL = 3600
+
+# đánh dấu "giữ nguyên" cho các trường có thể đặt về None
+UNCHANGED = object()
+
+
+def select_employees(ids=None, department_id=None, position_id=None):
+    """Nhân viên theo danh sách id và/hoặc bộ lọc phòng ban/chức vụ (kết hợp AND)."""
+    qs = Employee.objects.all()
+    if ids:
+        qs = qs.filter(id__in=ids)
+    if department_id:
+        qs = qs.filter(department_id=department_id)
+    if position_id:
+        qs = qs.filter(position_id=position_id)
+    return qs
+
+
+def bulk_update_employees(emp_ids, shift_id=UNCHANGED, role_id=UNCHANGED, is_active=None,
+                          location_mode=None, location_ids=()):
+    """Áp dụng thay đổi cho các nhân viên `emp_ids`. location_mode: "add", "remove" hoặc "set".
+
+    ValueError (chưa ghi gì) nếu ca, vai trò hoặc địa điểm không tồn tại.
+    """
+    fields = {}
+    if shift_id is not UNCHANGED:
+        fields["shift_id"] = shift_id
+    if role_id is not UNCHANGED:
+        fields["role_id"] = role_id
+    if is_active is not None:
+        fields["is_active"] = is_active
+    Through = Employee.allowed_locations.through
+    location_ids = set(location_ids)
+    # id không tồn tại sẽ vi phạm khóa ngoại lúc ghi: kiểm tra trước
+    missing = location_ids - set(WorkLocation.objects.filter(id__in=location_ids).values_list("id", flat=True))
+    if missing:
+        raise ValueError(f"Địa điểm không tồn tại: {', '.join(map(str, sorted(missing)))}.")
+    if fields.get("shift_id") is not None and not Shift.objects.filter(id=fields["shift_id"]).exists():
+        raise ValueError(f"Ca làm việc không tồn tại: {fields['shift_id']}.")
+    if fields.get("role_id") is not None and not Role.objects.filter(id=fields["role_id"]).exists():
+        raise ValueError(f"Vai trò không tồn tại: {fields['role_id']}.")
+
+    with transaction.atomic():
+        employees = Employee.objects.filter(id__in=emp_ids)
+        if fields:
+            employees.update(**fields)
+        links = Through.objects.filter(employee_id__in=emp_ids)
+        if location_mode == "remove":
+            links.filter(worklocation_id__in=location_ids).delete()
+        elif location_mode == "set":
+            links.exclude(worklocation_id__in=location_ids).delete()
+        if location_mode in ("add", "set") and location_ids:
+            # unique (employee, worklocation) bỏ qua các cặp đã có
+            Through.objects.bulk_create(
+                [Through(employee_id=e, worklocation_id=l) for e in emp_ids for l in location_ids],
+                batch_size=500, ignore_conflicts=True,
+            )
+        user_ids = list(employees.values_list("user_id", flat=True))
+        if "shift_id" in fields:
+            # update() không phát signal: lịch ca từ hôm nay trải lại theo ca mới
+            schedule_changed(employees.values_list("id", flat=True), timezone.localdate())
+    employees_changed(*user_ids)
+    return len(user_ids)
+
+
+# ---------------- Reset mật khẩu chạy nền -----------------
+
+_jobs = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-reset")
+
+
+def _job_key(job_id):
+    return f"bulk-job:{job_id}"
+
+
+def job_progress(job_id):
+    """{"total", "done", "status": running|done|failed} hoặc None nếu không có job."""
+    return cache.get(_job_key(job_id))
+
+
+def _set_progress(job_id, total, done, status):
+    cache.set(_job_key(job_id), {"total": total, "done": done, "status": status}, JOB_TTL)
+
+
+def reset_passwords(job_id, user_ids):
+    done = 0
+    try:
+        with ThreadPoolExecutor(max_workers=RESET_HASH_WORKERS) as pool:
+            for i in range(0, len(user_ids), RESET_CHUNK_SIZE):
+                chunk = user_ids[i:i + RESET_CHUNK_SIZE]
+                hashes = pool.map(make_password, [DEFAULT_PASSWORD] * len(chunk))
+                User.objects.bulk_update([User(id=u, password=h) for u, h in zip(chunk, hashes)], ["password"])
+                done += len(chunk)
+                _set_progress(job_id, len(user_ids), done, "running")
+        _set_progress(job_id, len(user_ids), done, "done")
+    except Exception:
+        logger.exception("Reset mật khẩu hàng loạt thất bại (job %s)", job_id)
+        _set_progress(job_id, len(user_ids), done, "failed")
+    finally:
+        close_old_connections()
+
+
+def start_password_reset(emp_ids):
+    """Đưa việc reset mật khẩu về mặc định của các nhân viên vào hàng đợi nền. Trả về job id."""
+    user_ids = list(Employee.objects.filter(id__in=emp_ids).values_list("user_id", flat=True))
+    job_id = uuid.uuid4().hex
+    _set_progress(job_id, len(user_ids), 0, "running")
+    _jobs.submit(reset_passwords, job_id, user_ids)
+    return job_id
@@ -0,0 +1,208 @@
+import time
+import uuid
+from django.core.cache import cache
+from django.db import connection, transaction
+
+# ---------------- Idempotent clock-in -----------------
+
+IDEMPOTENCY_TTL = 24 * 3600                # giữ phản hồi để trả lại khi thiết bị gửi lại (giây)
+IDEMPOTENCY_NAMESPACE = uuid.UUID("8f0d6c52-3b7e-4f3a-9a51-6d2b9c1e7a44")
+
+
+def clock_client_id(user_id, idempotency_key=None, client_id=None):
+    """UUID định danh một lần chấm công: client_id của thiết bị, hoặc suy ra từ header Idempotency-Key.
+
+    Khóa từ header được gắn với user nên hai tài khoản dùng trùng khóa không đụng nhau.
+    Trả về None nếu request không mang khóa nào; ValueError nếu client_id không phải UUID.
+    """
+    if client_id:
+        return uuid.UUID(str(client_id))
+    if idempotency_key:
+        return uuid.uuid5(IDEMPOTENCY_NAMESPACE, f"{user_id}:{idempotency_key}")
+    return None
+
+
+def _idempotency_key(user_id, client_id):
+    return f"clock-idem:{user_id}:{client_id}"
+
+
+def get_idempotent_response(user_id, client_id):
+    return cache.get(_idempotency_key(user_id, client_id))
+
+
+def remember_idempotent_response(user_id, client_id, payload):
+    cache.set(_idempotency_key(user_id, client_id), payload, IDEMPOTENCY_TTL)
+
+
+# ---------------- Clock state (last punch per employee) -----------------
+
+CLOCK_STATE_TTL = 36 * 3600
+_NO_PUNCH = ("", None)
+
+
+def _clock_state_key(employee_id):
+    return f"clock-state:{employee_id}"
+
+
+def get_clock_state(employee_id):
+    """(type, timestamp) của lần chấm công mới nhất; đọc cache, nếu thiếu thì dựng lại từ DB."""
+    key = _clock_state_key(employee_id)
+    state = cache.get(key)
+    if state is None:
+        from .models import Attendance
+        last = (Attendance.objects.filter(employee_id=employee_id)
+                .order_by("-work_date", "-timestamp").values_list("type", "timestamp").first())
+        state = tuple(last) if last else _NO_PUNCH
+        cache.set(key, state, CLOCK_STATE_TTL)
+    return state if state[1] is not None else None
+
+
+def set_clock_state(employee_id, type_, timestamp):
+    # chỉ dùng khi punch vừa ghi chắc chắn là mới nhất (api_clock); các đường ghi khác gọi invalidate
+    cache.set(_clock_state_key(employee_id), (type_, timestamp), CLOCK_STATE_TTL)
+
+
+def invalidate_clock_state(employee_id):
+    cache.delete(_clock_state_key(employee_id))
+
+
+def next_clock_type(employee_id, now, work_date=None):
+    """IN/OUT tự động: OUT nếu lần chấm mới nhất cùng ngày công với `now` là IN.
+
+    `work_date(ts)` cho ngày công của một thời điểm (RosterIndex.work_date, để OUT sau nửa đêm của ca
+    qua đêm vẫn thuộc ca hôm trước); mặc định là ngày địa phương.
+    """
+    if work_date is None:
+        from .utils import local_work_date as work_date
+    state = get_clock_state(employee_id)
+    if state and state[0] == "IN" and work_date(state[1]) == work_date(now):
+        return "OUT"
+    return "IN"
+
+
+# ---------------- Clocking context (per user) -----------------
+
+CLOCKING_CONTEXT_TTL = 12 * 3600
+
+
+def _clocking_context_key(user_id):
+    return f"clock-ctx:{user_id}"
+
+
+def get_clocking_context(user_id):
+    """Dữ liệu cần cho một lần chấm công của user, cache theo user id.
+
+    {"employee_id", "is_active", "shift" (Shift hoặc None), "role" (tên), "allowed_location_ids"};
+    employee_id là None nếu user không phải nhân viên. Tọa độ/bán kính địa điểm lấy từ
+    geofence_index() theo id. Bị xóa bởi các signal trong signals.py khi HR đổi dữ liệu.
+    """
+    key = _clocking_context_key(user_id)
+    ctx = cache.get(key)
+    if ctx is None:
+        from .models import Employee
+        emp = Employee.objects.select_related("shift", "role").filter(user_id=user_id).first()
+        if emp is None:
+            ctx = {"employee_id": None, "is_active": False, "shift": None, "role": None, "allowed_location_ids": []}
+        else:
+            ctx = {
+                "employee_id": emp.id,
+                "is_active": emp.is_active,
+                "shift": emp.shift,
+                "role": emp.role.name if emp.role else None,
+                "allowed_location_ids": list(emp.allowed_locations.values_list("id", flat=True)),
+            }
+        cache.set(key, ctx, CLOCKING_CONTEXT_TTL)
+    return ctx
+
+
+def invalidate_clocking_context(*user_ids):
+    cache.delete_many([_clocking_context_key(u) for u in user_ids])
+
+
+# ---------------- JWT claims staleness -----------------
+
+CLAIMS_VERSION_TTL = 2 * 24 * 3600          # >= REFRESH_TOKEN_LIFETIME: token cũ hơn mốc này đọc lại từ DB
+
+
+def _claims_version_key(user_id):
+    return f"claims-ver:{user_id}"
+
+
+def mark_claims_stale(*user_ids):
+    # claims của access token phát hành trước thời điểm này bị bỏ qua (EmployeeClaimsAuthentication đọc DB)
+    now = time.time()
+    cache.set_many({_claims_version_key(u): now for u in user_ids}, CLAIMS_VERSION_TTL)
+
+
+def claims_stale_since(user_id):
+    return cache.get(_claims_version_key(user_id))
+
+
+# ---------------- Monitor feed -----------------
+
+MONITOR_VERSION_KEY = "monitor-version"
+
+
+def bump_monitor_version():
+    # mỗi lần ghi chấm công; màn hình giám sát chỉ truy vấn DB khi giá trị này đổi
+    try:
+        return cache.incr(MONITOR_VERSION_KEY)
+    except ValueError:
+        cache.add(MONITOR_VERSION_KEY, 1, None)
+        return cache.get(MONITOR_VERSION_KEY)
+
+
+def monitor_version():
+    return cache.get(MONITOR_VERSION_KEY, 0)
+
+
+# ---------------- History payloads -----------------
+
+HISTORY_TTL = 24 * 3600
+HISTORY_VERSION_KEY = "history-version"
+
+
+def _history_version_key(employee_id):
+    return f"{HISTORY_VERSION_KEY}:{employee_id}"
+
+
+def _fresh_version():
+    # khóa phiên bản bị cache loại bỏ thì bắt đầu lại từ mốc thời gian, không quay về giá trị đã dùng
+    return time.time_ns()
+
+
+def _bump_history_keys(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _fresh_version(), None)
+
+
+def bump_history_version(*employee_ids):
+    """Làm mất hiệu lực lịch sử đã lưu của các nhân viên; không truyền id thì của mọi nhân viên."""
+    keys = [_history_version_key(e) for e in employee_ids] or [HISTORY_VERSION_KEY]
+    _bump_history_keys(keys)
+    if connection.in_atomic_block:
+        # request đọc giữa lúc bump và commit có thể lưu lại dữ liệu cũ dưới phiên bản mới
+        transaction.on_commit(lambda: _bump_history_keys(keys))
+
+
+def _history_key(employee_id, period, start, variant):
+    keys = [HISTORY_VERSION_KEY, _history_version_key(employee_id)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _fresh_version(), None)
+            versions[key] = cache.get(key)
+    return f"history:{employee_id}:{period}:{start}:{variant}:{versions[keys[0]]}:{versions[keys[1]]}"
+
+
+def get_history_payload(employee_id, period, start, variant=""):
+    """(khóa cache, (etag, last_modified, payload) hoặc None); variant phân biệt các dạng payload (compact, fields)."""
+    key = _history_key(employee_id, period, start, variant)
+    return key, cache.get(key)
+
+
+def set_history_payload(key, etag, last_modified, payload):
+    cache.set(key, (etag, last_modified, payload), HISTORY_TTL)
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# cache riêng từng tiến trình: việc xóa cache của signal chỉ tới được tiến trình đã ghi
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """Clocking context, claims, lịch sử, chỉ mục lưu trữ và tiến độ job nằm trong cache: cache phải dùng chung."""
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f"Cache mặc định ({backend}) là riêng từng tiến trình.",
+        hint="Các worker khác và lệnh manage.py không thấy thay đổi (nhân viên bị khóa vẫn chấm công được tới "
+             "12 giờ, tiến độ job trống). Dùng FileBasedCache hoặc đặt REDIS_URL.",
+        id="attendance.E001",
+    )]
@@ -0,0 +1,169 @@
+# Import nhân viên hàng loạt từ file CSV/XLSX (trang HR "Import Excel").
+#
+# Dòng được đọc dần theo từng khối IMPORT_CHUNK_SIZE; mỗi khối được kiểm tra với bảng tra vai trò/
+# địa điểm nạp sẵn một lần, rồi ghi User, Employee và bảng nối allowed_locations bằng bulk_create
+# trong một transaction (vài truy vấn cho cả khối thay vì vài truy vấn cho mỗi người).
+import codecs
+import csv
+import itertools
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree.ElementTree import ParseError
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import Role, WorkLocation, Employee
+from .xlsx import iter_xlsx_rows
+
+IMPORT_COLUMNS = ("username", "first_name", "last_name", "email", "phone", "work_location_id", "role")
+REQUIRED_COLUMNS = ("username",)
+IMPORT_CHUNK_SIZE = 1000
+DEFAULT_PASSWORD = "12345678"
+# mật khẩu riêng theo từng dòng (cột password, tùy chọn) được băm song song khi nhiều hơn ngưỡng này
+PARALLEL_HASH_MIN = 16
+
+
+class ImportFileError(Exception):
+    """File không đọc được hoặc thiếu cột bắt buộc."""
+
+
+def iter_import_rows(fileobj, filename):
+    """Sinh (số dòng, dict cột -> giá trị) từ file .csv hoặc .xlsx; dòng 1 là tiêu đề."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".csv":
+        rows = csv.reader(codecs.iterdecode(fileobj, "utf-8-sig"))
+    elif ext == ".xlsx":
+        rows = iter_xlsx_rows(fileobj)
+    else:
+        raise ImportFileError("Chỉ hỗ trợ file .xlsx hoặc .csv.")
+    try:
+        header = [h.strip().lower() for h in next(rows, [])]
+        missing = [c for c in REQUIRED_COLUMNS if c not in header]
+        if missing:
+            raise ImportFileError(f"Thiếu cột: {', '.join(missing)}.")
+        for line_no, values in enumerate(rows, 2):
+            if not any(str(v).strip() for v in values):
+                continue
+            yield line_no, {h: str(v).strip() for h, v in zip(header, values) if h}
+    except (zipfile.BadZipFile, ParseError, KeyError, UnicodeDecodeError, csv.Error) as e:
+        raise ImportFileError(f"Không đọc được file: {e}")
+
+
+class EmployeeImporter:
+    """Kiểm tra và ghi từng khối dòng; gom lỗi theo số dòng trong file."""
+
+    def __init__(self, workers=None):
+        # pool tiến trình băm mật khẩu chỉ được tạo khi một khối có nhiều hơn PARALLEL_HASH_MIN mật khẩu riêng
+        self.workers = workers
+        self.pool = None
+        self.roles = {name.lower(): rid for rid, name in Role.objects.values_list("id", "name")}
+        self.roles.update({str(rid): rid for rid in self.roles.values()})
+        self.location_ids = set(WorkLocation.objects.values_list("id", flat=True))
+        # mật khẩu mặc định giống nhau và đã công khai: băm một lần cho cả lần import
+        self.default_hash = make_password(DEFAULT_PASSWORD)
+        self.seen = set()
+        self.created = 0
+        self.errors = []  # [(số dòng, thông báo)]
+
+    def _validate(self, row):
+        username = row.get("username", "")
+        if not username:
+            return "Thiếu username."
+        if len(username) > 150:
+            return "Username quá dài."
+        if username.lower() in self.seen:
+            return "Username bị trùng trong file."
+        role = row.get("role", "")
+        if role and role.lower() not in self.roles:
+            return f"Vai trò không tồn tại: {role}."
+        loc = row.get("work_location_id", "")
+        if loc:
+            try:
+                # ô số của Excel đọc ra 3.0; "nan" là ValueError, "inf"/"1e999" là OverflowError
+                value = float(loc)
+                if not value.is_integer():
+                    raise ValueError(loc)
+                loc_id = int(value)
+            except (ValueError, OverflowError):
+                return f"work_location_id không hợp lệ: {loc}."
+            if loc_id not in self.location_ids:
+                return f"Địa điểm không tồn tại: {loc_id}."
+            row["work_location_id"] = loc_id
+        return None
+
+    def _hash_passwords(self, passwords):
+        if len(passwords) <= PARALLEL_HASH_MIN:
+            return [make_password(p) for p in passwords]
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        return list(self.pool.map(make_password, passwords, chunksize=max(1, len(passwords) // 32)))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def import_chunk(self, chunk):
+        valid = []
+        for line_no, row in chunk:
+            error = self._validate(row)
+            if error:
+                self.errors.append((line_no, error))
+                continue
+            self.seen.add(row["username"].lower())
+            valid.append((line_no, row))
+
+        existing = {u.lower() for u in User.objects.filter(username__in=[r["username"] for _, r in valid])
+                    .values_list("username", flat=True)}
+        rows = []
+        for line_no, row in valid:
+            if row["username"].lower() in existing:
+                self.errors.append((line_no, "Username đã tồn tại."))
+            else:
+                rows.append(row)
+        if not rows:
+            return
+
+        own = [r for r in rows if r.get("password")]
+        for row, hashed in zip(own, self._hash_passwords([r["password"] for r in own])):
+            row["password_hash"] = hashed
+
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(username=r["username"], password=r.get("password_hash", self.default_hash),
+                     first_name=r.get("first_name", "")[:150], last_name=r.get("last_name", "")[:150],
+                     email=r.get("email", ""))
+                for r in rows
+            ], batch_size=500)
+            # bulk_create chỉ trả id trên PostgreSQL: đọc lại theo username
+            user_ids = dict(User.objects.filter(username__in=[r["username"] for r in rows]).values_list("username", "id"))
+            Employee.objects.bulk_create([
+                Employee(user_id=user_ids[r["username"]], phone=r.get("phone", "")[:32], is_active=True,
+                         role_id=self.roles[r["role"].lower()] if r.get("role") else None)
+                for r in rows
+            ], batch_size=500)
+            emp_ids = dict(Employee.objects.filter(user_id__in=user_ids.values()).values_list("user_id", "id"))
+            Through = Employee.allowed_locations.through
+            Through.objects.bulk_create([
+                Through(employee_id=emp_ids[user_ids[r["username"]]], worklocation_id=r["work_location_id"])
+                for r in rows if r.get("work_location_id")
+            ], batch_size=500)
+        self.created += len(rows)
+
+
+def import_employees(fileobj, filename, chunk_size=IMPORT_CHUNK_SIZE, workers=None):
+    """Import toàn bộ file. Trả về (số nhân viên đã tạo, [(số dòng, lỗi)]); ImportFileError nếu file hỏng."""
+    rows = iter_import_rows(fileobj, filename)
+    importer = EmployeeImporter(workers)
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            importer.import_chunk(chunk)
+    finally:
+        importer.close()
+    return importer.created, sorted(importer.errors)
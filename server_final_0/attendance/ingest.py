@@ -0,0 +1,205 @@
+# Ghi chấm công theo lô (group commit) cho giờ cao điểm.
+#
+# Khi bật ATTENDANCE_GROUP_COMMIT, api_clock không INSERT từng punch: punch được ghi vào nhật ký
+# chỉ-ghi-thêm trên đĩa (fsync, dùng chung một lần fsync cho các request đến cùng lúc) rồi đưa vào
+# hàng đợi trong tiến trình. Một thread nền ghi hàng đợi xuống DB bằng bulk_create trong một
+# transaction mỗi ATTENDANCE_GROUP_COMMIT_INTERVAL_MS ms hoặc khi đủ ATTENDANCE_GROUP_COMMIT_MAX_ROWS dòng.
+# Đoạn nhật ký của một lô chỉ bị xóa sau khi lô đã commit; nếu tiến trình dừng đột ngột, chạy
+# `python manage.py replay_punch_journal` trước khi khởi động lại để ghi nốt các punch còn trong nhật ký.
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from django.utils.dateparse import parse_datetime
+
+from .models import Attendance
+from .summary import rebuild_punch_days
+from .caching import bump_monitor_version
+from .utils import local_work_date
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FIELDS = ("employee_id", "type", "latitude", "longitude", "distance_m", "within_geofence",
+                  "work_location_id", "note", "created_by_id")
+
+
+def group_commit_enabled():
+    return getattr(settings, "ATTENDANCE_GROUP_COMMIT", False)
+
+
+def encode_punch(att):
+    record = {f: getattr(att, f) for f in JOURNAL_FIELDS}
+    record["timestamp"] = att.timestamp.isoformat()
+    record["client_id"] = str(att.client_id)
+    return json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+
+def decode_punch(line):
+    record = json.loads(line)
+    ts = parse_datetime(record.pop("timestamp"))
+    return Attendance(timestamp=ts, work_date=local_work_date(ts), client_id=uuid.UUID(record.pop("client_id")), **record)
+
+
+def write_punches(rows):
+    """Ghi một lô punch trong một transaction và cập nhật bảng tổng hợp của các nhân viên liên quan."""
+    days = [r.work_date for r in rows]
+    with transaction.atomic():
+        # client_id trùng (gửi lại, hoặc replay nhật ký đã commit một phần) bị bỏ qua
+        Attendance.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+        rebuild_punch_days(days, {r.employee_id for r in rows})
+    # bulk_create không phát signal post_save
+    bump_monitor_version()
+
+
+class GroupCommitQueue:
+    """Hàng đợi punch trong tiến trình, có nhật ký trên đĩa làm xác nhận bền vững."""
+
+    def __init__(self, journal_dir, interval_ms=50, max_rows=500):
+        self.journal_dir = journal_dir
+        self.interval = interval_ms / 1000.0
+        self.max_rows = max_rows
+        os.makedirs(journal_dir, exist_ok=True)
+        self._prefix = f"punch-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._segment = 0
+        self._file = None
+        self._written = 0          # số bản ghi đã ghi vào nhật ký
+        self._synced = 0           # số bản ghi đã fsync
+        self._pending = []
+        self._failed = []          # [(lô, đoạn nhật ký)] ghi DB lỗi, thử lại ở lần flush sau
+        self._lock = threading.Lock()        # nhật ký + hàng đợi
+        self._sync_lock = threading.Lock()   # một thread fsync cho cả nhóm
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _segment_path(self, n):
+        return os.path.join(self.journal_dir, f"{self._prefix}-{n}.log")
+
+    def submit(self, att):
+        """Ghi punch vào nhật ký và hàng đợi; trả về khi bản ghi đã nằm trên đĩa."""
+        line = encode_punch(att)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self._segment_path(self._segment), "ab")
+            self._file.write(line)
+            self._written += 1
+            seq = self._written
+            self._pending.append(att)
+            full = len(self._pending) >= self.max_rows
+        if full:
+            self._wake.set()
+        self._sync(seq)
+
+    def _sync(self, seq):
+        # request nào lấy được khóa trước sẽ fsync giùm mọi bản ghi đã ghi tới lúc đó
+        with self._sync_lock:
+            if self._synced >= seq:
+                return
+            with self._lock:
+                f, target = self._file, self._written
+                f.flush()
+            os.fsync(f.fileno())
+            self._synced = target
+
+    def _take(self):
+        # lấy cả hàng đợi và niêm phong đoạn nhật ký tương ứng trong cùng một bước
+        with self._sync_lock, self._lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return [], None
+            path = self._segment_path(self._segment)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            self._segment += 1
+            self._synced = self._written
+        return batch, path
+
+    def flush(self):
+        """Ghi mọi punch đang chờ xuống DB. Trả về số punch đã ghi."""
+        with self._flush_lock:
+            batches, self._failed = self._failed, []
+            batch, path = self._take()
+            if batch:
+                batches.append((batch, path))
+            done = 0
+            for batch, path in batches:
+                try:
+                    write_punches(batch)
+                except Exception:
+                    logger.exception("Ghi lô %s punch thất bại, sẽ thử lại", len(batch))
+                    self._failed.append((batch, path))
+                    continue
+                os.remove(path)
+                done += len(batch)
+            return done
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending) + sum(len(b) for b, _ in self._failed)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="punch-group-commit", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def punch_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                q = GroupCommitQueue(
+                    settings.ATTENDANCE_JOURNAL_DIR,
+                    interval_ms=settings.ATTENDANCE_GROUP_COMMIT_INTERVAL_MS,
+                    max_rows=settings.ATTENDANCE_GROUP_COMMIT_MAX_ROWS,
+                )
+                q.start()
+                _queue = q
+    return _queue
+
+
+def submit_punch(att):
+    """Đưa một punch (chưa lưu, đã có client_id và work_date) vào hàng đợi ghi theo lô."""
+    punch_queue().submit(att)
+
+
+def replay_journal(journal_dir, chunk_size=1000):
+    """Ghi lại các punch còn trong nhật ký (tiến trình cũ dừng trước khi flush). Trả về số punch đọc được.
+
+    Chỉ chạy khi không có tiến trình server nào đang dùng thư mục nhật ký.
+    """
+    count = 0
+    for path in sorted(glob.glob(os.path.join(journal_dir, "punch-*.log"))):
+        rows = []
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # dòng ghi dở khi mất điện: request đó chưa được xác nhận
+                rows.append(decode_punch(line))
+        for i in range(0, len(rows), chunk_size):
+            write_punches(rows[i:i + chunk_size])
+        os.remove(path)
+        count += len(rows)
+    return count
@@ -0,0 +1,62 @@
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.archive import archive_month, closed_months, verify_month, rebuild_index
+from attendance.models import Attendance, ArchivedMonth
+from attendance.utils import month_bounds
+
+
+def _parse_month(value):
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise CommandError(f"Tháng không hợp lệ: {value} (định dạng YYYY-MM)")
+
+
+class Command(BaseCommand):
+    help = "Chuyển các tháng chấm công đã đóng sang file lưu trữ (archive), kiểm tra (verify) hoặc dựng lại chỉ mục (rebuild)."
+
+    def add_arguments(self, parser):
+        sub = parser.add_subparsers(dest="action", required=True)
+        archive = sub.add_parser("archive", help="Chuyển các tháng cũ khỏi bảng Attendance")
+        archive.add_argument("--keep-months", type=int, default=settings.ATTENDANCE_HOT_MONTHS,
+                             help="Số tháng gần nhất giữ trong DB (kể cả tháng hiện tại)")
+        archive.add_argument("--month", action="append", dest="months", help="Chỉ lưu trữ tháng YYYY-MM, có thể lặp lại")
+        sub.add_parser("verify", help="Kiểm tra file lưu trữ khớp với chỉ mục")
+        sub.add_parser("rebuild", help="Dựng lại chỉ mục ArchivedMonth từ các file trên đĩa")
+
+    def handle(self, *args, **opts):
+        getattr(self, f"_{opts['action']}")(opts)
+
+    def _archive(self, opts):
+        months = [_parse_month(m) for m in opts["months"]] if opts["months"] else closed_months(opts["keep_months"])
+        if not months:
+            self.stdout.write("Không có tháng nào cần lưu trữ.")
+        for month in months:
+            entry = archive_month(month)
+            if entry:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{month:%Y-%m}: {entry.row_count} punch, {entry.changelog_count} log, {entry.size_bytes} byte -> {entry.path}"))
+
+    def _verify(self, opts):
+        failed = 0
+        for entry in ArchivedMonth.objects.all():
+            problems = verify_month(entry)
+            start, end = month_bounds(entry.month)
+            hot = Attendance.objects.filter(work_date__gte=start, work_date__lte=end).count()
+            if hot:
+                self.stdout.write(self.style.WARNING(f"{entry.month:%Y-%m}: còn {hot} punch mới trong DB, chạy lại archive --month {entry.month:%Y-%m}"))
+            if problems:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"{entry.month:%Y-%m}: {'; '.join(problems)}"))
+            else:
+                self.stdout.write(f"{entry.month:%Y-%m}: OK ({entry.row_count} punch)")
+        if failed:
+            raise CommandError(f"{failed} tháng lưu trữ bị lỗi.")
+
+    def _rebuild(self, opts):
+        count, missing = rebuild_index()
+        for month in missing:
+            self.stdout.write(self.style.WARNING(f"{month:%Y-%m}: không còn file lưu trữ, đã xóa khỏi chỉ mục"))
+        self.stdout.write(self.style.SUCCESS(f"Đã dựng lại chỉ mục cho {count} tháng."))
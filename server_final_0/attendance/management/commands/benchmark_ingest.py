@@ -0,0 +1,104 @@
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from attendance.ingest import GroupCommitQueue
+from attendance.models import Employee, WorkLocation, Attendance
+from attendance.summary import refresh_daily_summary
+from attendance.utils import local_work_date
+
+BENCH_PREFIX = "bench-ingest-"
+
+
+def _punch(emp, loc, i):
+    now = timezone.now()
+    return Attendance(
+        employee=emp, timestamp=now, work_date=local_work_date(now), type="IN" if i % 2 == 0 else "OUT",
+        latitude=loc.latitude, longitude=loc.longitude, distance_m=0, within_geofence=True,
+        work_location=loc, client_id=uuid.uuid4(),
+    )
+
+
+class Command(BaseCommand):
+    help = ("Đo số lần chấm công/giây khi ghi từng punch (autocommit) và khi ghi theo lô (group commit). "
+            "Tạo dữ liệu tạm trong DB hiện tại rồi xóa khi xong.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--punches", type=int, default=2000, help="Tổng số punch mỗi chế độ")
+        parser.add_argument("--threads", type=int, default=16, help="Số request đồng thời (mỗi thread một nhân viên)")
+        parser.add_argument("--interval-ms", type=int, default=50)
+        parser.add_argument("--max-rows", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        threads, per_thread = opts["threads"], max(1, opts["punches"] // opts["threads"])
+        loc = WorkLocation.objects.create(name=f"{BENCH_PREFIX}loc", latitude=10.0, longitude=106.0)
+        employees = [
+            Employee.objects.create(user=User.objects.create(username=f"{BENCH_PREFIX}{uuid.uuid4().hex[:12]}"))
+            for _ in range(threads)
+        ]
+        try:
+            self._report("Ghi từng punch (autocommit)", *self._run(employees, per_thread, lambda emp, i: self._write_one(emp, loc, i)))
+
+            journal_dir = tempfile.mkdtemp(prefix=BENCH_PREFIX)
+            queue = GroupCommitQueue(journal_dir, interval_ms=opts["interval_ms"], max_rows=opts["max_rows"])
+            queue.start()
+            start = time.perf_counter()
+            acked, ack_elapsed, errors = self._run(employees, per_thread, lambda emp, i: queue.submit(_punch(emp, loc, i)))
+            while queue.pending_count():
+                time.sleep(0.01)
+            queue.flush()
+            self._report("Ghi theo lô (group commit), xác nhận", acked, ack_elapsed, errors)
+            self._report("Ghi theo lô (group commit), đã vào DB", acked, time.perf_counter() - start, errors)
+            shutil.rmtree(journal_dir, ignore_errors=True)
+        finally:
+            Attendance.objects.filter(work_location=loc).delete()
+            User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+            loc.delete()
+
+    def _write_one(self, emp, loc, i):
+        # cùng đường ghi với api_clock ở chế độ mặc định
+        att = _punch(emp, loc, i)
+        with transaction.atomic():
+            att.save()
+        refresh_daily_summary(emp, att.work_date)
+
+    def _run(self, employees, per_thread, write):
+        done, errors = [0], [0]
+        lock = threading.Lock()
+
+        def worker(emp):
+            ok = failed = 0
+            try:
+                for i in range(per_thread):
+                    try:
+                        write(emp, i)
+                        ok += 1
+                    except Exception:
+                        failed += 1
+            finally:
+                connection.close()
+            with lock:
+                done[0] += ok
+                errors[0] += failed
+
+        pool = [threading.Thread(target=worker, args=(emp,)) for emp in employees]
+        start = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        return done[0], time.perf_counter() - start, errors[0]
+
+    def _report(self, label, count, elapsed, errors):
+        rate = count / elapsed if elapsed else 0.0
+        line = f"{label}: {count} punch trong {elapsed:.2f}s = {rate:.0f} punch/s"
+        if errors:
+            line += f" ({errors} lỗi)"
+        self.stdout.write(line)
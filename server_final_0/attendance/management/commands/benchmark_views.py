@@ -0,0 +1,135 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from attendance.models import Employee
+from attendance.serializers import EmployeeTokenObtainPairSerializer
+
+from .seed_benchmark_data import SEED_PREFIX
+
+# Số truy vấn tối đa cho một request (kể cả lần đầu khi cache còn trống). Các con số này không
+# phụ thuộc số nhân viên/số ngày: vượt ngân sách nghĩa là có truy vấn lặp theo dòng (N+1).
+QUERY_BUDGETS = {
+    "api_clock": 10,
+    "api_history_day": 3,
+    "api_history_week": 3,
+    "api_history_month": 3,
+    "web_dashboard_day": 7,
+    "web_dashboard_month": 7,
+    "web_dashboard_year": 7,
+    "web_monthly": 8,
+    "web_monthly_rows": 6,
+    "web_monthly_export_csv": 5,
+    "web_monthly_export_xlsx": 5,
+    "web_monitor": 4,
+    "web_monitor_feed": 4,
+}
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = ("Đo thời gian (p50/p95) và số truy vấn của các view chính trên dữ liệu seed (seed_benchmark_data), "
+            "ghi kết quả ra file JSON; thoát với lỗi nếu view nào vượt ngân sách truy vấn.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20, help="Số lần gọi mỗi view")
+        parser.add_argument("--output", default="benchmark_baseline.json", help="File JSON ghi kết quả")
+        parser.add_argument("--compare", help="So sánh p95 với một file kết quả trước đó")
+        parser.add_argument("--only", action="append", help="Chỉ chạy kịch bản có tên này, có thể lặp lại")
+
+    def handle(self, *args, **opts):
+        admin = User.objects.filter(username=f"{SEED_PREFIX}admin").first()
+        emp = (Employee.objects.select_related("user").filter(user__username__startswith=SEED_PREFIX, is_active=True,
+                                                              shift__isnull=False, allowed_locations__isnull=False)
+               .order_by("id").first())
+        if admin is None or emp is None:
+            raise CommandError("Chưa có dữ liệu seed, chạy `python manage.py seed_benchmark_data` trước.")
+        loc = emp.allowed_locations.first()
+
+        web = Client()
+        web.force_login(admin)
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f"Bearer {EmployeeTokenObtainPairSerializer.get_token(emp.user).access_token}")
+        today = timezone.localdate()
+        day, month = today.isoformat(), today.strftime("%Y-%m")
+
+        scenarios = {
+            "api_clock": lambda: api.post("/api/clock/", {"latitude": loc.latitude, "longitude": loc.longitude}, format="json"),
+            "api_history_day": lambda: api.get(f"/api/attendance/history/?period=day&date={day}"),
+            "api_history_week": lambda: api.get(f"/api/attendance/history/?period=week&date={day}"),
+            "api_history_month": lambda: api.get(f"/api/attendance/history/?period=month&date={day}"),
+            "web_dashboard_day": lambda: web.get(f"/web/dashboard/?view=day&date={day}"),
+            "web_dashboard_month": lambda: web.get(f"/web/dashboard/?view=month&date={day}"),
+            "web_dashboard_year": lambda: web.get(f"/web/dashboard/?view=year&date={day}"),
+            "web_monthly": lambda: web.get(f"/web/attendance/monthly/?month={month}"),
+            "web_monthly_rows": lambda: web.get(f"/web/attendance/monthly/rows/?month={month}&after_id={emp.id}"),
+            "web_monthly_export_csv": lambda: web.get(f"/web/attendance/monthly/export/?month={month}"),
+            "web_monthly_export_xlsx": lambda: web.get(f"/web/attendance/monthly/export/?month={month}&format=xlsx"),
+            "web_monitor": lambda: web.get("/web/monitor/"),
+            "web_monitor_feed": lambda: web.get("/web/monitor/feed/"),
+        }
+        if opts["only"]:
+            unknown = set(opts["only"]) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Không có kịch bản: {', '.join(sorted(unknown))}")
+            scenarios = {k: v for k, v in scenarios.items() if k in opts["only"]}
+
+        results = {}
+        over = []
+        for name, call in scenarios.items():
+            timings, queries = [], []
+            for _ in range(opts["repeat"]):
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    resp = call()
+                    if resp.streaming:
+                        for _chunk in resp.streaming_content:
+                            pass
+                    timings.append((time.perf_counter() - start) * 1000)
+                if resp.status_code >= 400:
+                    raise CommandError(f"{name}: HTTP {resp.status_code}")
+                queries.append(len(ctx.captured_queries))
+            budget = QUERY_BUDGETS.get(name)
+            results[name] = {
+                "p50_ms": round(statistics.median(timings), 2), "p95_ms": round(_percentile(timings, 95), 2),
+                "queries_max": max(queries), "queries_warm": queries[-1], "budget": budget,
+            }
+            line = (f"{name:26} p50 {results[name]['p50_ms']:8.1f} ms  p95 {results[name]['p95_ms']:8.1f} ms  "
+                    f"truy vấn {max(queries):3d}/{budget}")
+            if budget is not None and max(queries) > budget:
+                over.append(name)
+                self.stdout.write(self.style.ERROR(line + "  VƯỢT NGÂN SÁCH"))
+            else:
+                self.stdout.write(line)
+
+        baseline = {
+            "created_at": timezone.now().isoformat(), "repeat": opts["repeat"],
+            "employees": Employee.objects.filter(user__username__startswith=SEED_PREFIX).count(),
+            "results": results,
+        }
+        with open(opts["output"], "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        self.stdout.write(f"Đã ghi kết quả vào {opts['output']}.")
+
+        if opts["compare"]:
+            with open(opts["compare"], encoding="utf-8") as f:
+                previous = json.load(f)["results"]
+            for name, res in results.items():
+                if name in previous and previous[name]["p95_ms"]:
+                    change = (res["p95_ms"] / previous[name]["p95_ms"] - 1) * 100
+                    self.stdout.write(f"{name:26} p95 {previous[name]['p95_ms']:8.1f} -> {res['p95_ms']:8.1f} ms ({change:+.0f}%)")
+
+        if over:
+            raise CommandError(f"Vượt ngân sách truy vấn: {', '.join(over)}")
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.roster import expand_roster
+from attendance.summary import rebuild_daily_summaries
+from attendance.utils import month_bounds
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Ngày không hợp lệ: {value} (định dạng YYYY-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = ("Trải lịch ca theo ngày (ScheduledShift) từ phân công ca và ca mặc định của nhân viên. "
+            "Mặc định: tháng hiện tại và tháng sau (chạy định kỳ, ví dụ hằng tuần).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="Ngày bắt đầu YYYY-MM-DD (mặc định: đầu tháng hiện tại)")
+        parser.add_argument("--end", help="Ngày kết thúc YYYY-MM-DD (mặc định: cuối tháng sau)")
+        parser.add_argument("--employee", type=int, action="append", dest="employees", help="Chỉ trải cho nhân viên (id), có thể lặp lại")
+        parser.add_argument("--summaries", action="store_true", help="Tính lại bảng tổng hợp các ngày đã qua theo lịch mới")
+
+    def handle(self, *args, **opts):
+        today = timezone.localdate()
+        start = _parse_date(opts["start"]) if opts["start"] else today.replace(day=1)
+        end = _parse_date(opts["end"]) if opts["end"] else month_bounds(month_bounds(today)[1] + timedelta(days=1))[1]
+        if end < start:
+            raise CommandError("--end phải sau --start")
+        count = expand_roster(opts["employees"], start, end)
+        self.stdout.write(f"Đã trải {count} ngày lịch ca từ {start} đến {end}.")
+        if opts["summaries"] and start <= today:
+            rows = rebuild_daily_summaries(start, min(end, today), employee_ids=opts["employees"])
+            self.stdout.write(f"Đã tính lại {rows} dòng tổng hợp.")
+        self.stdout.write(self.style.SUCCESS("Xong."))
@@ -0,0 +1,29 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.summary import rebuild_daily_summaries
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Ngày không hợp lệ: {value} (định dạng YYYY-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = "Tính lại bảng tổng hợp công theo ngày (DailyWorkSummary) trong một khoảng ngày."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="Ngày bắt đầu YYYY-MM-DD (mặc định: hôm nay)")
+        parser.add_argument("--end", help="Ngày kết thúc YYYY-MM-DD (mặc định: bằng --start)")
+        parser.add_argument("--employee", type=int, action="append", dest="employees", help="Chỉ tính cho nhân viên (id), có thể lặp lại")
+
+    def handle(self, *args, **opts):
+        start = _parse_date(opts["start"]) if opts["start"] else timezone.localdate()
+        end = _parse_date(opts["end"]) if opts["end"] else start
+        if end < start:
+            raise CommandError("--end phải sau --start")
+        count = rebuild_daily_summaries(start, end, employee_ids=opts["employees"])
+        self.stdout.write(self.style.SUCCESS(f"Đã tính lại {count} dòng tổng hợp từ {start} đến {end}."))
@@ -0,0 +1,35 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance import geofence
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Ngày không hợp lệ: {value} (định dạng YYYY-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = "Tính lại distance_m/within_geofence của các punch đã lưu theo tọa độ và bán kính hiện tại của địa điểm."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--location", type=int, action="append", dest="locations", help="Id địa điểm, có thể lặp lại (mặc định: tất cả)")
+        parser.add_argument("--start", help="Từ ngày YYYY-MM-DD")
+        parser.add_argument("--end", help="Đến ngày YYYY-MM-DD")
+        parser.add_argument("--chunk", type=int, default=geofence.REEVALUATE_CHUNK, help="Số punch mỗi khối")
+
+    def handle(self, *args, **opts):
+        start = _parse_date(opts["start"]) if opts["start"] else None
+        end = _parse_date(opts["end"]) if opts["end"] else None
+        if start and end and end < start:
+            raise CommandError("--end phải sau --start")
+        if geofence.np is None:
+            self.stdout.write(self.style.WARNING("Chưa cài numpy, tính khoảng cách bằng Python thuần (chậm hơn)."))
+        began = time.perf_counter()
+        result = geofence.reevaluate_geofence(opts["locations"], start, end, opts["chunk"])
+        for loc_id, (scanned, changed) in result.items():
+            self.stdout.write(f"Địa điểm {loc_id}: {scanned} punch, sửa {changed}")
+        self.stdout.write(self.style.SUCCESS(f"Xong trong {time.perf_counter() - began:.1f} giây."))
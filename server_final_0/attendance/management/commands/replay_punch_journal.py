@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from attendance.ingest import replay_journal
+
+
+class Command(BaseCommand):
+    help = "Ghi vào DB các lần chấm công còn trong nhật ký ghi theo lô (chạy trước khi khởi động server)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=None, help="Thư mục nhật ký (mặc định: ATTENDANCE_JOURNAL_DIR)")
+
+    def handle(self, *args, **opts):
+        journal_dir = opts["dir"] or settings.ATTENDANCE_JOURNAL_DIR
+        count = replay_journal(journal_dir)
+        self.stdout.write(self.style.SUCCESS(f"Đã ghi lại {count} lần chấm công từ {journal_dir}."))
@@ -0,0 +1,145 @@
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from attendance.models import Department, Position, Role, WorkLocation, Shift, Employee, Attendance, AttendanceChangeLog
+from attendance.summary import rebuild_daily_summaries
+from attendance.roster import expand_roster
+from attendance.archive import delete_by_ids
+from attendance.utils import invalidate_geofence_index, month_bounds
+
+SEED_PREFIX = "seed-"
+SEED_PASSWORD = "12345678"
+BATCH = 5000
+INSERT_BATCH = 500  # SQLite giới hạn 500 dòng mỗi câu INSERT nhiều dòng
+
+
+class Command(BaseCommand):
+    help = ("Tạo dữ liệu giả lập để đo hiệu năng (nhân viên, phòng ban, ca, địa điểm và chấm công nhiều tháng). "
+            "Mọi đối tượng có tiền tố 'seed-'; chạy lại với --clear để xóa dữ liệu cũ trước (--clear --employees 0 chỉ xóa).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--employees", type=int, default=5000)
+        parser.add_argument("--months", type=int, default=12, help="Số tháng chấm công, tính lùi từ tháng hiện tại")
+        parser.add_argument("--departments", type=int, default=20)
+        parser.add_argument("--locations", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=1, help="Hạt giống ngẫu nhiên (để dữ liệu lặp lại được)")
+        parser.add_argument("--clear", action="store_true", help="Xóa dữ liệu seed cũ trước khi tạo")
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(opts["seed"])
+        if opts["clear"]:
+            self._clear()
+            if not opts["employees"]:
+                self.stdout.write(self.style.SUCCESS("Đã xóa dữ liệu seed."))
+                return
+        elif User.objects.filter(username__startswith=SEED_PREFIX).exists():
+            raise CommandError("Đã có dữ liệu seed, dùng --clear để tạo lại.")
+
+        roles = [Role.objects.get_or_create(name=n)[0] for n in ("Quản trị viên", "Nhân sự", "Trưởng phòng")]
+        shifts = [
+            Shift.objects.get_or_create(name=f"{SEED_PREFIX}{name}", defaults={"start_time": st, "end_time": en})[0]
+            for name, st, en in (("sáng", time(7), time(16)), ("hành chính", time(8), time(17)), ("chiều", time(13), time(22)))
+        ]
+        with transaction.atomic():
+            depts = [Department.objects.create(name=f"{SEED_PREFIX}phòng {i + 1}") for i in range(opts["departments"])]
+            positions = [Position.objects.create(name=f"{SEED_PREFIX}nhân viên", department=d) for d in depts]
+            WorkLocation.objects.bulk_create([
+                WorkLocation(name=f"{SEED_PREFIX}cơ sở {i + 1}", latitude=10.7 + rnd.uniform(-0.2, 0.2),
+                             longitude=106.6 + rnd.uniform(-0.2, 0.2), radius_m=200)
+                for i in range(opts["locations"])
+            ])
+            locations = list(WorkLocation.objects.filter(name__startswith=SEED_PREFIX))
+            invalidate_geofence_index()
+            employees = self._employees(opts["employees"], rnd, roles, shifts, depts, positions, locations)
+        self.stdout.write(f"Đã tạo {len(employees)} nhân viên, {len(depts)} phòng ban, {len(locations)} địa điểm.")
+
+        start, end = self._period(opts["months"])
+        # lịch ca trải sẵn tới hết tháng sau như khi chạy build_roster định kỳ
+        expand_roster(None, start - timedelta(days=1), month_bounds(month_bounds(end)[1] + timedelta(days=1))[1])
+        count = self._punches(employees, locations, start, end, rnd)
+        self.stdout.write(f"Đã tạo {count} lần chấm công từ {start} đến {end}.")
+        rows = 0
+        month = start
+        while month <= end:
+            # từng tháng một để giới hạn bộ nhớ của bước ghép cặp
+            rows += rebuild_daily_summaries(month, min(month_bounds(month)[1], end))
+            month = month_bounds(month)[1] + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f"Đã tính {rows} dòng tổng hợp. Đăng nhập: {SEED_PREFIX}admin / {SEED_PASSWORD}"))
+
+    def _clear(self):
+        users = User.objects.filter(username__startswith=SEED_PREFIX)
+        ids = list(Attendance.objects.filter(work_location__name__startswith=SEED_PREFIX).values_list("id", flat=True))
+        with transaction.atomic():
+            delete_by_ids(AttendanceChangeLog, "attendance_id", ids)
+            delete_by_ids(Attendance, "id", ids)
+        users.delete()
+        Department.objects.filter(name__startswith=SEED_PREFIX).delete()
+        WorkLocation.objects.filter(name__startswith=SEED_PREFIX).delete()
+        Shift.objects.filter(name__startswith=SEED_PREFIX).delete()
+
+    def _period(self, months):
+        end = timezone.localdate()
+        start = end.replace(day=1)
+        for _ in range(months - 1):
+            start = (start - timedelta(days=1)).replace(day=1)
+        return start, end
+
+    def _employees(self, n, rnd, roles, shifts, depts, positions, locations):
+        password = make_password(SEED_PASSWORD)
+        User.objects.create_superuser(f"{SEED_PREFIX}admin", "", SEED_PASSWORD)
+        User.objects.bulk_create([
+            User(username=f"{SEED_PREFIX}{i:06d}", password=password, first_name=f"NV{i}", last_name="Seed")
+            for i in range(n)
+        ], batch_size=INSERT_BATCH)
+        user_ids = dict(User.objects.filter(username__startswith=SEED_PREFIX).exclude(username=f"{SEED_PREFIX}admin")
+                        .values_list("username", "id"))
+        rows = []
+        for i in range(n):
+            d = i % len(depts)
+            # khoảng 2% giữ vai trò quản lý để có dữ liệu cho các trang phân quyền
+            role = roles[i % 3] if i % 50 == 0 else None
+            rows.append(Employee(user_id=user_ids[f"{SEED_PREFIX}{i:06d}"], department=depts[d], position=positions[d],
+                                 shift=shifts[i % len(shifts)], role=role, is_active=rnd.random() > 0.03))
+        Employee.objects.bulk_create(rows, batch_size=INSERT_BATCH)
+        employees = list(Employee.objects.filter(user_id__in=user_ids.values())
+                         .values_list("id", "shift__start_time", "shift__end_time").order_by("id"))
+        Through = Employee.allowed_locations.through
+        Through.objects.bulk_create([
+            Through(employee_id=emp_id, worklocation_id=locations[idx % len(locations)].id)
+            for idx, (emp_id, _, _) in enumerate(employees)
+        ], batch_size=INSERT_BATCH)
+        return employees
+
+    def _punches(self, employees, locations, start, end, rnd):
+        tz = timezone.get_default_timezone()
+        count = 0
+        batch = []
+        day = start
+        while day <= end:
+            if day.weekday() < 6:
+                for idx, (emp_id, st, en) in enumerate(employees):
+                    if rnd.random() < 0.05:
+                        continue  # vắng
+                    loc = locations[idx % len(locations)]
+                    t_in = timezone.make_aware(datetime.combine(day, st), tz) + timedelta(minutes=rnd.gauss(0, 10))
+                    t_out = timezone.make_aware(datetime.combine(day, en), tz) + timedelta(minutes=rnd.gauss(5, 15))
+                    for ts, t in ((t_in, "IN"), (t_out, "OUT")):
+                        dist = abs(rnd.gauss(0, 60))
+                        batch.append(Attendance(employee_id=emp_id, timestamp=ts, work_date=day, type=t,
+                                                latitude=loc.latitude, longitude=loc.longitude, distance_m=round(dist, 2),
+                                                within_geofence=dist <= loc.radius_m, work_location_id=loc.id))
+                    if len(batch) >= BATCH:
+                        Attendance.objects.bulk_create(batch, batch_size=INSERT_BATCH)
+                        count += len(batch)
+                        batch = []
+            day += timedelta(days=1)
+        if batch:
+            Attendance.objects.bulk_create(batch, batch_size=INSERT_BATCH)
+            count += len(batch)
+        return count
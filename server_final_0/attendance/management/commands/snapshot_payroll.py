@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.models import PayrollSnapshot
+from attendance.payroll import build_snapshot, is_closed, is_current
+
+
+def _parse_month(value):
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise CommandError(f"Tháng không hợp lệ: {value} (định dạng YYYY-MM)")
+
+
+class Command(BaseCommand):
+    help = ("Chốt bảng công của các tháng đã kết thúc (mặc định: tháng trước và các tháng có snapshot hết hiệu lực) "
+            "thành PayrollSnapshot; bỏ qua tháng đã có snapshot còn hiệu lực. Có thể chạy định kỳ bằng cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", action="append", dest="months", help="Tháng YYYY-MM, có thể lặp lại")
+        parser.add_argument("--workers", type=int, help="Số tiến trình tính song song (mặc định: số CPU)")
+        parser.add_argument("--force", action="store_true", help="Tính lại kể cả khi snapshot còn hiệu lực")
+
+    def handle(self, *args, **opts):
+        if opts["months"]:
+            months = [_parse_month(m) for m in opts["months"]]
+        else:
+            months = {(timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=1)}
+            # tháng có sửa công sau khi chốt: web tính trực tiếp cho tới khi được chốt lại
+            months |= (set(PayrollSnapshot.objects.filter(stale=True).values_list("month", flat=True))
+                       - set(PayrollSnapshot.objects.filter(stale=False).values_list("month", flat=True)))
+            months = sorted(months)
+        for month in months:
+            if not is_closed(month):
+                raise CommandError(f"{month:%Y-%m} chưa kết thúc, không thể chốt.")
+            latest = PayrollSnapshot.objects.filter(month=month).order_by("-computed_at").first()
+            if latest and not opts["force"] and is_current(latest):
+                self.stdout.write(f"{month:%Y-%m}: snapshot lúc {timezone.localtime(latest.computed_at):%Y-%m-%d %H:%M} còn hiệu lực.")
+                continue
+            snapshot = build_snapshot(month, opts["workers"])
+            self.stdout.write(self.style.SUCCESS(
+                f"{month:%Y-%m}: {snapshot.row_count} nhân viên, sha256 {snapshot.content_hash[:12]}"))
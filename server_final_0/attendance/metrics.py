@@ -0,0 +1,125 @@
+# Số đo request/SQL theo view và bộ đếm chấm công, xuất ở /metrics theo định dạng text của Prometheus.
+#
+# MetricsMiddleware đo thời gian mỗi request, đếm số câu SQL và thời gian SQL qua
+# connection.execute_wrapper rồi cộng vào bảng số đo của tiến trình dưới một khóa (chỉ vài phép
+# cộng mỗi request). Mỗi tiến trình worker có bảng riêng; khi chạy nhiều tiến trình Prometheus
+# cần scrape từng tiến trình (hoặc cộng theo instance).
+import threading
+import time
+from bisect import bisect_left
+
+from django.db import connection
+
+# cận trên (giây) của các bucket histogram thời gian request
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_lock = threading.Lock()
+_views = {}     # view -> [bucket counts..., +Inf count, tổng thời gian, số request, số SQL, thời gian SQL]
+_counters = {}  # (tên, nhãn) -> giá trị
+
+N_BUCKETS = len(LATENCY_BUCKETS) + 1
+PUNCH_RESULTS = ("accepted", "outside_geofence", "rejected_location")
+
+
+def observe_request(view, seconds, sql_count, sql_seconds):
+    idx = bisect_left(LATENCY_BUCKETS, seconds)
+    with _lock:
+        row = _views.get(view)
+        if row is None:
+            row = _views[view] = [0] * N_BUCKETS + [0.0, 0, 0, 0.0]
+        row[idx] += 1
+        row[N_BUCKETS] += seconds
+        row[N_BUCKETS + 1] += 1
+        row[N_BUCKETS + 2] += sql_count
+        row[N_BUCKETS + 3] += sql_seconds
+
+
+def inc(name, labels=(), amount=1):
+    """Cộng `amount` vào bộ đếm `name`; labels là tuple các cặp (nhãn, giá trị)."""
+    key = (name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def count_punch(result, amount=1):
+    """result: accepted, outside_geofence (đã lưu nhưng ngoài vùng) hoặc rejected_location."""
+    inc("attendance_punches_total", (("result", result),), amount)
+
+
+def reset():
+    with _lock:
+        _views.clear()
+        _counters.clear()
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    # giá trị nhãn là tên URL/route nên không cần escape
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render():
+    """Toàn bộ số đo ở định dạng text của Prometheus."""
+    with _lock:
+        views = {v: list(row) for v, row in _views.items()}
+        counters = dict(_counters)
+    for result in PUNCH_RESULTS:
+        counters.setdefault(("attendance_punches_total", (("result", result),)), 0)
+
+    lines = [
+        "# HELP http_request_duration_seconds Thời gian xử lý request theo view.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for view, row in sorted(views.items()):
+        cumulative = 0
+        for le, n in zip(LATENCY_BUCKETS + ("+Inf",), row[:N_BUCKETS]):
+            cumulative += n
+            lines.append(f"http_request_duration_seconds_bucket{_labels((('view', view), ('le', le)))} {cumulative}")
+        lines.append(f"http_request_duration_seconds_sum{_labels((('view', view),))} {row[N_BUCKETS]:.6f}")
+        lines.append(f"http_request_duration_seconds_count{_labels((('view', view),))} {row[N_BUCKETS + 1]}")
+    lines += ["# HELP django_sql_queries_total Số câu SQL theo view.", "# TYPE django_sql_queries_total counter"]
+    lines += [f"django_sql_queries_total{_labels((('view', v),))} {row[N_BUCKETS + 2]}" for v, row in sorted(views.items())]
+    lines += ["# HELP django_sql_duration_seconds_total Tổng thời gian SQL theo view.",
+              "# TYPE django_sql_duration_seconds_total counter"]
+    lines += [f"django_sql_duration_seconds_total{_labels((('view', v),))} {row[N_BUCKETS + 3]:.6f}"
+              for v, row in sorted(views.items())]
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _SqlTimer:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sql = _SqlTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(sql):
+            response = self.get_response(request)
+        match = request.resolver_match
+        observe_request((match.url_name or match.view_name) if match else "<unresolved>",
+                        time.perf_counter() - start, sql.count, sql.seconds)
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 3.0.14 on 2026-10-16 23:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_employee_shift_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyWorkSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('work_date', models.DateField()),
+                ('first_in', models.DateTimeField(blank=True, null=True)),
+                ('last_out', models.DateTimeField(blank=True, null=True)),
+                ('worked_hours', models.FloatField(default=0)),
+                ('late', models.BooleanField(default=False)),
+                ('early_leave', models.BooleanField(default=False)),
+                ('punch_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='attendance.Employee')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='dailyworksummary',
+            index=models.Index(fields=['work_date', 'employee'], name='attendance__work_da_732a90_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyworksummary',
+            unique_together={('employee', 'work_date')},
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_work_date(apps, schema_editor):
+    Attendance = apps.get_model('attendance', 'Attendance')
+    tz = timezone.get_default_timezone()
+    batch = []
+    for a in Attendance.objects.filter(work_date__isnull=True).only('id', 'timestamp').iterator(chunk_size=2000):
+        a.work_date = timezone.localdate(a.timestamp, tz)
+        batch.append(a)
+        if len(batch) >= 2000:
+            Attendance.objects.bulk_update(batch, ['work_date'])
+            batch = []
+    if batch:
+        Attendance.objects.bulk_update(batch, ['work_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_dailyworksummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='work_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_work_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attendance',
+            name='work_date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['employee', 'work_date', 'timestamp'], name='attendance__employe_e93f0e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['work_date', 'type'], name='attendance__work_da_d81267_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-16 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_attendance_work_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='client_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
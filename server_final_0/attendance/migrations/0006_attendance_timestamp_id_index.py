@@ -0,0 +1,17 @@
+# Generated by Django 3.0.14 on 2026-10-16 23:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_attendance_client_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['timestamp', 'id'], name='attendance__timesta_cdf7e8_idx'),
+        ),
+    ]
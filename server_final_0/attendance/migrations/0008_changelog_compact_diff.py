@@ -0,0 +1,78 @@
+import json
+
+from django.db import migrations, models
+
+LOGGED_FIELDS = ("type", "timestamp", "latitude", "longitude", "work_location_id", "note")
+
+
+def _snapshot(data):
+    # before_data/after_data cũ là AttendanceSerializer(a).data (work_location lồng nhau)
+    if isinstance(data, str):
+        data = json.loads(data or "{}")
+    data = dict(data or {})
+    loc = data.get("work_location")
+    data["work_location_id"] = loc.get("id") if isinstance(loc, dict) else loc
+    return {f: data.get(f) for f in LOGGED_FIELDS}
+
+
+def compact_changelog(apps, schema_editor):
+    Log = apps.get_model('attendance', 'AttendanceChangeLog')
+    batch = []
+    for log in Log.objects.filter(action="edited").only('id', 'before_data', 'after_data').iterator(chunk_size=2000):
+        before, after = _snapshot(log.before_data), _snapshot(log.after_data)
+        changed = {f: [before[f], after[f]] for f in LOGGED_FIELDS if before[f] != after[f]}
+        log.changes = json.dumps(changed, ensure_ascii=False, separators=(",", ":")) if changed else ""
+        batch.append(log)
+        if len(batch) >= 2000:
+            Log.objects.bulk_update(batch, ['changes'])
+            batch = []
+    if batch:
+        Log.objects.bulk_update(batch, ['changes'])
+
+
+def expand_changelog(apps, schema_editor):
+    # migrate ngược: changes chỉ giữ các trường đã đổi, nên before_data/after_data chỉ có các trường đó
+    Log = apps.get_model('attendance', 'AttendanceChangeLog')
+    batch = []
+    for log in Log.objects.exclude(changes="").only('id', 'changes').iterator(chunk_size=2000):
+        changed = json.loads(log.changes)
+        log.before_data = json.dumps({f: v[0] for f, v in changed.items()}, ensure_ascii=False)
+        log.after_data = json.dumps({f: v[1] for f, v in changed.items()}, ensure_ascii=False)
+        batch.append(log)
+        if len(batch) >= 2000:
+            Log.objects.bulk_update(batch, ['before_data', 'after_data'])
+            batch = []
+    if batch:
+        Log.objects.bulk_update(batch, ['before_data', 'after_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_archivedmonth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancechangelog',
+            name='changes',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(compact_changelog, expand_changelog),
+        migrations.RemoveField(
+            model_name='attendancechangelog',
+            name='after_data',
+        ),
+        migrations.RemoveField(
+            model_name='attendancechangelog',
+            name='before_data',
+        ),
+        migrations.AddIndex(
+            model_name='attendancechangelog',
+            index=models.Index(fields=['attendance', 'changed_at'], name='attendance__attenda_3dd78a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancechangelog',
+            index=models.Index(fields=['changed_by', 'changed_at'], name='attendance__changed_d6965e_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.0.14 on 2026-10-17 00:14
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_changelog_compact_diff'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('rows', models.BinaryField()),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'get_latest_by': 'computed_at',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='attendancechangelog',
+            index=models.Index(fields=['changed_at'], name='attendance__changed_d17fbb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollsnapshot',
+            index=models.Index(fields=['month', 'computed_at'], name='attendance__month_9b2246_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.0.14 on 2026-10-17 00:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_payrollsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftAssignment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rotation', models.CharField(blank=True, default='', max_length=255)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_assignments', to='attendance.Employee')),
+                ('shift', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='attendance.Shift')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScheduledShift',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('work_date', models.DateField()),
+                ('start_at', models.DateTimeField(blank=True, null=True)),
+                ('end_at', models.DateTimeField(blank=True, null=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_shifts', to='attendance.Employee')),
+                ('shift', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='attendance.Shift')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='shiftassignment',
+            index=models.Index(fields=['employee', 'start_date'], name='attendance__employe_65e9e2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledshift',
+            index=models.Index(fields=['work_date', 'employee'], name='attendance__work_da_489de5_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='scheduledshift',
+            unique_together={('employee', 'work_date')},
+        ),
+    ]
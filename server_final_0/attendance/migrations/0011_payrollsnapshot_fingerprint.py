@@ -0,0 +1,23 @@
+# Generated by Django 3.0.14 on 2026-10-17 00:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_shift_roster'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollsnapshot',
+            name='punch_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='payrollsnapshot',
+            name='punch_max_id',
+            field=models.IntegerField(default=0),
+        ),
+    ]
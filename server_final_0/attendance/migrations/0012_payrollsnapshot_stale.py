@@ -0,0 +1,26 @@
+# Generated by Django 3.0.14 on 2026-10-17 01:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0011_payrollsnapshot_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='payrollsnapshot',
+            name='punch_count',
+        ),
+        migrations.RemoveField(
+            model_name='payrollsnapshot',
+            name='punch_max_id',
+        ),
+        migrations.AddField(
+            model_name='payrollsnapshot',
+            name='stale',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,8 +1,10 @@
+import json
 
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.contrib.postgres.fields import JSONField
+from django.core.serializers.json import DjangoJSONEncoder
+from .utils import local_work_date
 
 class Department(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -57,10 +59,65 @@ class Employee(models.Model):
     def username(self):
         return self.user.get_username()
 
+class ShiftAssignment(models.Model):
+    """Ca của nhân viên trong một khoảng ngày (thay cho Employee.shift); xem attendance/roster.py."""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='shift_assignments')
+    shift = models.ForeignKey(Shift, on_delete=models.CASCADE, null=True, blank=True)
+    # ca xoay vòng: id ca của từng ngày trong chu kỳ tính từ start_date, "-" là ngày nghỉ (ví dụ "1,1,2,2,-,-");
+    # để trống thì ngày nào cũng là `shift`
+    rotation = models.CharField(max_length=255, blank=True, default="")
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)  # None: không thời hạn
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['employee','start_date'])]
+
+    def rotation_ids(self):
+        return [None if v.strip() in ("-", "") else int(v) for v in self.rotation.split(",")] if self.rotation else []
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.end_date and self.end_date < self.start_date:
+            raise ValidationError("Ngày kết thúc phải sau ngày bắt đầu.")
+        try:
+            ids = self.rotation_ids()
+        except ValueError:
+            raise ValidationError({"rotation": "Chu kỳ gồm id ca hoặc '-' cách nhau bởi dấu phẩy."})
+        missing = {i for i in ids if i} - set(Shift.objects.filter(id__in=ids).values_list("id", flat=True))
+        if missing:
+            raise ValidationError({"rotation": f"Không có ca: {', '.join(map(str, sorted(missing)))}"})
+        if not ids and self.shift_id is None:
+            raise ValidationError("Chọn ca hoặc nhập chu kỳ ca.")
+
+    def shift_on(self, day):
+        """Id ca của ngày `day` (None: nghỉ)."""
+        ids = self.rotation_ids()
+        return ids[(day - self.start_date).days % len(ids)] if ids else self.shift_id
+
+    def __str__(self):
+        return f"{self.employee_id} {self.rotation or self.shift_id} từ {self.start_date}"
+
+class ScheduledShift(models.Model):
+    """Lịch ca đã trải theo ngày (mỗi nhân viên một dòng mỗi ngày, shift None là ngày nghỉ)."""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='scheduled_shifts')
+    work_date = models.DateField()
+    shift = models.ForeignKey(Shift, on_delete=models.CASCADE, null=True, blank=True)
+    start_at = models.DateTimeField(null=True, blank=True)
+    end_at = models.DateTimeField(null=True, blank=True)  # sau start_at; sang ngày hôm sau với ca qua đêm
+
+    class Meta:
+        unique_together = ('employee','work_date')
+        indexes = [models.Index(fields=['work_date','employee'])]
+
+    def __str__(self):
+        return f"{self.employee_id} {self.work_date} {self.shift_id or '-'}"
+
 class Attendance(models.Model):
     TYPE_CHOICES = (('IN','IN'), ('OUT','OUT'))
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendances', null=True, blank=True)
     timestamp = models.DateTimeField(default=timezone.now)
+    work_date = models.DateField(editable=False)  # ngày địa phương của timestamp, tự điền khi lưu
     type = models.CharField(max_length=3, choices=TYPE_CHOICES)
     latitude = models.FloatField()
     longitude = models.FloatField()
@@ -68,22 +125,112 @@ class Attendance(models.Model):
     within_geofence = models.BooleanField(default=False)
     work_location = models.ForeignKey(WorkLocation, on_delete=models.PROTECT, related_name='attendances')
     note = models.CharField(max_length=255, blank=True, default="")
+    client_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)  # UUID do thiết bị sinh (đồng bộ offline)
 
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='attendance_created')
     changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='attendance_changed')
     changed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee','work_date','timestamp']),
+            models.Index(fields=['work_date','type']),
+            models.Index(fields=['timestamp','id']),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.work_date = local_work_date(self.timestamp)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'timestamp' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'work_date'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.employee.username} {self.type} @ {self.timestamp:%Y-%m-%d %H:%M}"
 
 class AttendanceChangeLog(models.Model):
+    # các trường được so sánh khi sửa bản ghi; changes chỉ lưu trường thay đổi {"trường": [cũ, mới]}
+    LOGGED_FIELDS = ("type", "timestamp", "latitude", "longitude", "work_location_id", "note")
+
     attendance = models.ForeignKey(Attendance, on_delete=models.CASCADE, related_name='logs')
     action = models.CharField(max_length=32)  # created, edited, deleted
     reason = models.CharField(max_length=255, blank=True, default="")
-    before_data = JSONField(default=dict, blank=True)
-    after_data = JSONField(default=dict, blank=True)
+    changes = models.TextField(blank=True, default="")  # JSON gọn, rỗng với action "created"
     changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     changed_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['attendance','changed_at']),
+            models.Index(fields=['changed_by','changed_at']),
+            models.Index(fields=['changed_at']),
+        ]
+
+    @classmethod
+    def snapshot(cls, attendance):
+        data = {f: getattr(attendance, f) for f in cls.LOGGED_FIELDS}
+        data["timestamp"] = data["timestamp"].astimezone(timezone.utc)  # giờ sửa trên web là giờ địa phương
+        return data
+
+    @classmethod
+    def diff(cls, before, after):
+        """JSON các trường khác nhau giữa hai snapshot ("" nếu không đổi gì)."""
+        changed = {f: [before[f], after[f]] for f in cls.LOGGED_FIELDS if before[f] != after[f]}
+        return json.dumps(changed, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":")) if changed else ""
+
+    @property
+    def changes_dict(self):
+        return json.loads(self.changes) if self.changes else {}
+
     def __str__(self):
         return f"log {self.action} #{self.attendance_id}"
+
+class DailyWorkSummary(models.Model):
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='daily_summaries')
+    work_date = models.DateField()  # ngày theo giờ địa phương
+    first_in = models.DateTimeField(null=True, blank=True)
+    last_out = models.DateTimeField(null=True, blank=True)
+    worked_hours = models.FloatField(default=0)
+    late = models.BooleanField(default=False)
+    early_leave = models.BooleanField(default=False)
+    punch_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('employee','work_date')
+        indexes = [models.Index(fields=['work_date','employee'])]
+
+    def __str__(self):
+        return f"{self.employee_id} {self.work_date} {self.worked_hours:.2f}h"
+
+class ArchivedMonth(models.Model):
+    """Chỉ mục các tháng chấm công đã chuyển sang file lưu trữ (xem attendance/archive.py)."""
+    month = models.DateField(unique=True)  # ngày đầu tháng
+    path = models.CharField(max_length=255)  # tương đối với ATTENDANCE_ARCHIVE_DIR
+    row_count = models.PositiveIntegerField(default=0)
+    changelog_count = models.PositiveIntegerField(default=0)
+    size_bytes = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64)  # sha256 của file
+    archived_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['month']
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} ({self.row_count} punch)"
+
+class PayrollSnapshot(models.Model):
+    """Bảng công đã chốt của một tháng (xem attendance/payroll.py). Không sửa; tính lại thì tạo bản mới."""
+    month = models.DateField()  # ngày đầu tháng
+    rows = models.BinaryField()  # JSON nén zlib: [[username, họ tên, giờ từng ngày..., tổng giờ], ...]
+    row_count = models.PositiveIntegerField(default=0)
+    content_hash = models.CharField(max_length=64)  # sha256 của JSON chưa nén
+    computed_at = models.DateTimeField(default=timezone.now)
+    stale = models.BooleanField(default=False)  # bảng tổng hợp ngày của tháng đã đổi sau khi tính (payroll.mark_stale)
+
+    class Meta:
+        get_latest_by = 'computed_at'
+        indexes = [models.Index(fields=['month','computed_at'])]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} @ {self.computed_at:%Y-%m-%d %H:%M} ({self.row_count} nhân viên)"
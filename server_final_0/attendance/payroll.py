@@ -0,0 +1,114 @@
+# Bảng công đã chốt (PayrollSnapshot) cho các tháng đã kết thúc.
+#
+# `python manage.py snapshot_payroll` (chạy bằng cron) tính bảng công của một tháng, chia nhân viên theo
+# phòng ban cho một pool tiến trình, rồi lưu kết quả dưới dạng JSON nén kèm sha256 và thời điểm tính.
+# Bảng công tính từ DailyWorkSummary, nên mọi lần ghi bảng tổng hợp ngày (summary.py: sửa công, đồng bộ
+# offline, đổi lịch ca, rebuild_daily_summary...) của một tháng đã kết thúc đánh dấu snapshot của tháng đó
+# hết hiệu lực (stale) bằng một câu UPDATE. web_monthly/web_monthly_export đọc thẳng snapshot còn hiệu lực;
+# tháng chưa chốt hoặc snapshot hết hiệu lực được tính trực tiếp từ bảng tổng hợp như tháng hiện tại,
+# không tính lại snapshot trong request; lần chạy snapshot_payroll tiếp theo chốt lại.
+import hashlib
+import heapq
+import json
+import multiprocessing
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.db import connections
+from django.utils import timezone
+
+from .models import Employee, DailyWorkSummary, PayrollSnapshot
+from .summary import iter_employee_rows
+from .utils import month_bounds
+
+
+def month_days(month):
+    start, end = month_bounds(month)
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def is_closed(month):
+    return month_bounds(month)[1] < timezone.localdate()
+
+
+def _department_rows(month, department_id):
+    # chạy trong tiến trình con: mở kết nối DB riêng và đóng trước khi trả kết quả
+    try:
+        employees = Employee.objects.filter(department_id=department_id) if department_id else Employee.objects.filter(department__isnull=True)
+        start, end = month_bounds(month)
+        return list(iter_employee_rows(start, end, month_days(month), employees))
+    finally:
+        connections.close_all()
+
+
+def compute_rows(month, workers=None):
+    """Các dòng bảng công của tháng theo thứ tự nhân viên, mỗi phòng ban tính ở một tiến trình.
+
+    workers=1 tính ngay trong tiến trình hiện tại (dùng trong request web).
+    """
+    start, end = month_bounds(month)
+    if workers == 1:
+        return [row for _, row in iter_employee_rows(start, end, month_days(month))]
+    departments = list(Employee.objects.filter(is_active=True).values_list("department_id", flat=True).distinct())
+    # tiến trình con được fork không được dùng chung kết nối DB của tiến trình cha
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as pool:
+        parts = list(pool.map(_department_rows, [month] * len(departments), departments))
+    return [row for _, row in heapq.merge(*parts, key=lambda r: r[0])]
+
+
+def build_snapshot(month, workers=None):
+    month = month.replace(day=1)
+    computed_at = timezone.now()  # trước khi đọc
+    rows = compute_rows(month, workers)
+    data = json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode()
+    start, end = month_bounds(month)
+    snapshot = PayrollSnapshot.objects.create(
+        month=month, rows=zlib.compress(data), row_count=len(rows),
+        content_hash=hashlib.sha256(data).hexdigest(), computed_at=computed_at,
+    )
+    # bảng tổng hợp ghi trong lúc tính chỉ đánh dấu được các snapshot đã có
+    if DailyWorkSummary.objects.filter(work_date__gte=start, work_date__lte=end, updated_at__gte=computed_at).exists():
+        mark_stale(start, end)
+        snapshot.stale = True
+    return snapshot
+
+
+def mark_stale(start, end):
+    """Đánh dấu hết hiệu lực snapshot của các tháng đã kết thúc chứa ngày công trong [start, end]."""
+    if is_closed(start):
+        PayrollSnapshot.objects.filter(month__gte=start.replace(day=1), month__lte=end, stale=False).update(stale=True)
+
+
+def snapshot_rows(snapshot):
+    return json.loads(zlib.decompress(snapshot.rows))
+
+
+SNAPSHOT_INDEX_MAX = 4
+_snapshot_index = {}  # content_hash -> {username: dòng}, giữ vài snapshot gần nhất trong tiến trình
+
+
+def snapshot_by_username(snapshot):
+    """{username: dòng} của snapshot; giải nén một lần cho mỗi tiến trình (dùng khi xem bảng công theo trang)."""
+    index = _snapshot_index.get(snapshot.content_hash)
+    if index is None:
+        index = {row[0]: row for row in snapshot_rows(snapshot)}
+        if len(_snapshot_index) >= SNAPSHOT_INDEX_MAX:
+            _snapshot_index.pop(next(iter(_snapshot_index)))
+        _snapshot_index[snapshot.content_hash] = index
+    return index
+
+
+def is_current(snapshot):
+    """False nếu bảng tổng hợp ngày của tháng đã đổi sau khi tính snapshot (mark_stale)."""
+    return not snapshot.stale
+
+
+def month_snapshot(month):
+    """Snapshot còn hiệu lực của một tháng đã kết thúc, None nếu tháng chưa kết thúc, chưa chốt hoặc đã đổi."""
+    month = month.replace(day=1)
+    if not is_closed(month):
+        return None
+    snapshot = PayrollSnapshot.objects.filter(month=month).order_by("-computed_at").first()
+    return snapshot if snapshot is not None and is_current(snapshot) else None
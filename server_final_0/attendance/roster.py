@@ -0,0 +1,153 @@
+# Lịch ca theo ngày và tra punch -> ca.
+#
+# Ca của một nhân viên trong một ngày lấy từ ShiftAssignment (ca cố định hoặc xoay vòng) phủ ngày đó,
+# không có thì từ Employee.shift. Lịch được trải sẵn vào ScheduledShift (mỗi nhân viên một dòng mỗi ngày,
+# giờ bắt đầu/kết thúc đã tính, ca qua đêm kết thúc ngày hôm sau) theo từng tháng, bằng `build_roster` hoặc khi lần
+# đầu cần tới.
+# RosterIndex giữ các ca của một nhóm nhân viên sắp theo giờ bắt đầu và tìm ca của một punch bằng bisect;
+# punch thuộc ngày công của ca đó (OUT lúc 06:00 của ca 22:00-06:00 tính cho ngày hôm trước).
+# Lịch của ngày đã qua được giữ nguyên khi đổi Employee.shift; sửa ShiftAssignment thì trải lại từ ngày bắt đầu.
+from bisect import bisect_right
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Employee, Shift, ShiftAssignment, ScheduledShift
+from .utils import local_work_date, month_bounds
+
+# punch cách giờ bắt đầu/kết thúc ca trong khoảng này vẫn thuộc ca (vào sớm, tăng ca)
+MATCH_BEFORE = timedelta(hours=4)
+MATCH_AFTER = timedelta(hours=6)
+
+# late_at/early_at: vào sau late_at là đi trễ, ra trước early_at là về sớm
+Slot = namedtuple("Slot", "work_date shift_id start_at end_at late_at early_at")
+
+
+def shift_window(shift, day):
+    """(giờ bắt đầu, giờ kết thúc) của ca trong ngày `day` theo giờ địa phương; ca qua đêm kết thúc ngày hôm sau."""
+    tz = timezone.get_default_timezone()
+    start = timezone.make_aware(datetime.combine(day, shift.start_time), tz)
+    end_day = day + timedelta(days=1) if shift.end_time <= shift.start_time else day
+    return start, timezone.make_aware(datetime.combine(end_day, shift.end_time), tz)
+
+
+def _scope(qs, employee_ids, field="employee_id"):
+    # employee_ids None: mọi nhân viên (không sinh IN (...) với hàng nghìn id)
+    return qs if employee_ids is None else qs.filter(**{f"{field}__in": list(employee_ids)})
+
+
+def expand_roster(employee_ids, start, end):
+    """Trải lại lịch ca của các nhân viên (None: tất cả) trong [start, end] vào ScheduledShift. Trả về số dòng đã ghi."""
+    defaults = dict(_scope(Employee.objects, employee_ids, "id").values_list("id", "shift_id"))
+    shifts = Shift.objects.in_bulk()
+    assignments = {}
+    for a in (_scope(ShiftAssignment.objects, employee_ids).filter(start_date__lte=end)
+              .exclude(end_date__lt=start).order_by("-start_date", "-id")):
+        assignments.setdefault(a.employee_id, []).append(a)
+    rows = []
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    for emp_id, default in defaults.items():
+        own = assignments.get(emp_id, ())
+        for day in days:
+            # phân công bắt đầu muộn nhất còn hiệu lực thắng
+            shift_id = next((a.shift_on(day) for a in own
+                             if a.start_date <= day and (a.end_date is None or day <= a.end_date)), default)
+            shift = shifts.get(shift_id)
+            start_at, end_at = shift_window(shift, day) if shift else (None, None)
+            rows.append(ScheduledShift(employee_id=emp_id, work_date=day, shift=shift, start_at=start_at, end_at=end_at))
+    with transaction.atomic():
+        _scope(ScheduledShift.objects, employee_ids).filter(work_date__gte=start, work_date__lte=end).delete()
+        # request khác vừa trải cùng tháng: bỏ qua dòng trùng
+        ScheduledShift.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+    return len(rows)
+
+
+def clear_roster(employee_ids, start):
+    """Xóa lịch đã trải từ ngày `start` của các nhân viên; lần tra sau sẽ trải lại theo phân công hiện tại."""
+    _scope(ScheduledShift.objects, employee_ids).filter(work_date__gte=start).delete()
+
+
+class RosterIndex:
+    """Các ca của một nhóm nhân viên, sắp theo giờ bắt đầu để tìm ca của punch trong O(log n)."""
+
+    def __init__(self, rows):
+        # rows: (employee_id, work_date, shift_id, start_at, end_at, phút trễ cho phép, phút về sớm cho phép)
+        # theo employee_id, work_date
+        self.by_day = {}
+        self.starts = {}
+        self.slots = {}
+        for emp_id, day, shift_id, start_at, end_at, late_grace, early_grace in rows:
+            slot = Slot(day, shift_id, start_at, end_at, start_at + timedelta(minutes=late_grace),
+                        end_at - timedelta(minutes=early_grace))
+            self.by_day[(emp_id, day)] = slot
+            self.starts.setdefault(emp_id, []).append(start_at)
+            self.slots.setdefault(emp_id, []).append(slot)
+
+    def slot(self, emp_id, day):
+        """Ca của nhân viên trong ngày công `day` (None: nghỉ hoặc chưa có ca)."""
+        return self.by_day.get((emp_id, day))
+
+    def match(self, emp_id, ts):
+        """Ca chứa thời điểm `ts` (tính cả MATCH_BEFORE/MATCH_AFTER); hai ca cùng chứa thì lấy ca gần hơn."""
+        starts = self.starts.get(emp_id)
+        if not starts:
+            return None
+        slots = self.slots[emp_id]
+        # các ca bắt đầu trước ts + MATCH_BEFORE; ca trong ngày không chồng nhau nên chỉ cần xét hai ca cuối
+        i = bisect_right(starts, ts + MATCH_BEFORE)
+        best, best_gap = None, None
+        for slot in slots[max(0, i - 2):i]:
+            if ts > slot.end_at + MATCH_AFTER:
+                continue
+            gap = max(slot.start_at - ts, ts - slot.end_at, timedelta(0))
+            if best is None or gap <= best_gap:
+                best, best_gap = slot, gap
+        return best
+
+    def work_date(self, emp_id, ts):
+        """Ngày công của punch: ngày của ca chứa nó, không có ca thì ngày địa phương."""
+        slot = self.match(emp_id, ts)
+        return slot.work_date if slot else local_work_date(ts)
+
+    def days_touching(self, emp_id, day):
+        """Các ngày công có thể chứa punch của ngày địa phương `day` (ngày đó và ca qua đêm hôm trước/sau)."""
+        tz = timezone.get_default_timezone()
+        lo = timezone.make_aware(datetime.combine(day, datetime.min.time()), tz)
+        hi = lo + timedelta(days=1)
+        days = {day}
+        for other in (day - timedelta(days=1), day + timedelta(days=1)):
+            slot = self.by_day.get((emp_id, other))
+            if slot and slot.start_at - MATCH_BEFORE < hi and slot.end_at + MATCH_AFTER >= lo:
+                days.add(other)
+        return sorted(days)
+
+
+def _rows(start, end, employee_ids):
+    return list(_scope(ScheduledShift.objects, employee_ids).filter(work_date__gte=start, work_date__lte=end)
+                .order_by("employee_id", "work_date")
+                .values_list("employee_id", "work_date", "shift_id", "start_at", "end_at",
+                             "shift__late_grace_min", "shift__early_grace_min"))
+
+
+def load_roster(start, end, employee_ids=None):
+    """RosterIndex của các nhân viên (None: tất cả) cho các ngày công [start, end].
+
+    Nhân viên còn thiếu ngày nào trong khoảng thì được trải lịch cho cả các tháng chứa khoảng đó
+    (lần đầu trong tháng; `build_roster` trải sẵn để request không phải làm việc này).
+    """
+    if employee_ids is not None:
+        employee_ids = list(employee_ids)
+        if not employee_ids:
+            return RosterIndex(())
+    rows = _rows(start, end, employee_ids)
+    days = (end - start).days + 1
+    counts = Counter(r[0] for r in rows)
+    wanted = list(Employee.objects.values_list("id", flat=True)) if employee_ids is None else employee_ids
+    missing = [e for e in wanted if counts[e] < days]
+    if missing:
+        expand_roster(None if employee_ids is None and len(missing) == len(wanted) else missing,
+                      month_bounds(start)[0], month_bounds(end)[1])
+        rows = _rows(start, end, employee_ids)
+    return RosterIndex(r for r in rows if r[2] is not None)
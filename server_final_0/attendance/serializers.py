@@ -1,7 +1,12 @@
 
-from rest_framework import serializers
+from rest_framework import serializers, exceptions
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
+from django.utils import timezone
 from .models import Department, Position, Role, WorkLocation, Shift, Employee, Attendance
+from .authentication import apply_employee_claims
 
 class RoleSerializer(serializers.ModelSerializer):
     class Meta:
@@ -80,3 +85,71 @@ class HistoryItemSerializer(serializers.Serializer):
     total_hours = serializers.FloatField()
     late = serializers.BooleanField()
     early_leave = serializers.BooleanField()
+
+# ---------------- Đường nhanh cho payload chỉ đọc -----------------
+# Lịch sử/giám sát trả hàng trăm punch mỗi request: dựng trực tiếp từ values_list và bảng địa điểm
+# trong bộ nhớ (geofence_index) thay vì AttendanceSerializer, cho cùng dữ liệu với ít việc hơn nhiều.
+
+# trường của một punch trong lịch sử (như AttendanceSerializer) và cột values_list tương ứng, cùng thứ tự
+ATTENDANCE_ITEM_FIELDS = ("id", "employee", "employee_username", "timestamp", "type", "latitude", "longitude",
+                          "distance_m", "within_geofence", "work_location", "note")
+ATTENDANCE_ITEM_COLUMNS = ("id", "employee_id", "employee__user__username", "timestamp", "type", "latitude", "longitude",
+                           "distance_m", "within_geofence", "work_location_id", "note")
+_TIMESTAMP = ATTENDANCE_ITEM_FIELDS.index("timestamp")
+_WORK_LOCATION = ATTENDANCE_ITEM_FIELDS.index("work_location")
+
+
+def parse_fields(value, allowed, default=None):
+    """Các trường của tham số ?fields=a,b theo thứ tự của `allowed`; ValueError nếu có trường lạ."""
+    if not value:
+        return list(default or allowed)
+    requested = {f.strip() for f in value.split(",") if f.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(", ".join(sorted(unknown)))
+    return [f for f in allowed if f in requested]
+
+
+def location_data(loc):
+    """Như WorkLocationSerializer(loc).data."""
+    if loc is None:
+        return None
+    return {"id": loc.id, "name": loc.name, "latitude": loc.latitude, "longitude": loc.longitude, "radius_m": loc.radius_m}
+
+
+def attendance_items(rows, fields, locations, compact=False):
+    """Punch từ các tuple theo ATTENDANCE_ITEM_COLUMNS.
+
+    Mặc định mỗi punch là dict như AttendanceSerializer; compact=True trả mảng giá trị theo `fields`
+    với work_location là id (tra trong bảng địa điểm gửi kèm payload).
+    """
+    idx = [ATTENDANCE_ITEM_FIELDS.index(f) for f in fields]
+    items = []
+    for r in rows:
+        values = []
+        for i in idx:
+            v = r[i]
+            if i == _TIMESTAMP:
+                v = timezone.localtime(v).isoformat()
+            elif i == _WORK_LOCATION and not compact:
+                v = location_data(locations.get(v))
+            values.append(v)
+        items.append(values if compact else dict(zip(fields, values)))
+    return items
+
+
+class EmployeeTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return apply_employee_claims(super().get_token(user), user)
+
+class EmployeeTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh luôn đọc lại nhân viên từ DB để access token mới mang claims mới nhất."""
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        refresh = RefreshToken(data.get("refresh", attrs["refresh"]))
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}, is_active=True).first()
+        if user is None:
+            raise exceptions.AuthenticationFailed("User không tồn tại hoặc đã bị khóa.", code="user_inactive")
+        data["access"] = str(apply_employee_claims(refresh.access_token, user))
+        return data
@@ -0,0 +1,130 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Attendance, ArchivedMonth, Employee, Role, Shift, ShiftAssignment, ScheduledShift, WorkLocation
+from .caching import invalidate_clocking_context, mark_claims_stale, bump_monitor_version, bump_history_version
+from .utils import invalidate_geofence_index
+
+
+# trường được nhúng vào JWT (authentication.employee_claims); đổi trường khác không làm token cũ
+EMPLOYEE_CLAIM_FIELDS = ("shift_id", "role_id", "is_active")
+USER_CLAIM_FIELDS = ("username", "is_staff", "is_superuser", "is_active")
+
+
+def employees_changed(*user_ids, claims=True):
+    # cached clocking context is dropped; claims=True: JWT claims issued before now must be refreshed
+    if user_ids:
+        invalidate_clocking_context(*user_ids)
+        if claims:
+            mark_claims_stale(*user_ids)
+
+
+def _old_values(model, pk, fields):
+    return model.objects.filter(pk=pk).values_list(*fields).first() if pk else None
+
+
+def schedule_changed(employee_ids, start):
+    # sau commit: khi xóa nhân viên, phân công bị xóa theo trước nhân viên trong cùng transaction
+    from .summary import reschedule
+    employee_ids = list(employee_ids)
+    if employee_ids:
+        transaction.on_commit(lambda: reschedule(employee_ids, start))
+
+
+@receiver(pre_save, sender=Employee)
+def employee_saving(sender, instance, **kwargs):
+    instance._old_claims = _old_values(Employee, instance.pk, EMPLOYEE_CLAIM_FIELDS)
+
+
+@receiver([post_save, post_delete], sender=Employee)
+def employee_changed(sender, instance, created=False, **kwargs):
+    if kwargs["signal"] is post_delete:
+        employees_changed(instance.user_id)
+        return
+    old = getattr(instance, "_old_claims", None)
+    employees_changed(instance.user_id, claims=old != tuple(getattr(instance, f) for f in EMPLOYEE_CLAIM_FIELDS))
+    # đổi ca mặc định: lịch từ hôm nay trải lại, các ngày đã qua giữ ca cũ
+    if not created and (old[0] if old else None) != instance.shift_id:
+        schedule_changed([instance.pk], timezone.localdate())
+
+
+@receiver(m2m_changed, sender=Employee.allowed_locations.through)
+def allowed_locations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        employees_changed(instance.user_id)
+        return
+    # changed from the WorkLocation side: pk_set holds employee ids (None on clear)
+    employees = Employee.objects.all() if pk_set is None else Employee.objects.filter(pk__in=pk_set)
+    employees_changed(*employees.values_list("user_id", flat=True))
+
+
+# pre_delete: after the delete, employees already have shift/role = NULL
+@receiver([post_save, pre_delete], sender=Shift)
+def shift_changed(sender, instance, **kwargs):
+    employees_changed(*Employee.objects.filter(shift=instance).values_list("user_id", flat=True))
+    if kwargs["signal"] is post_save and not kwargs.get("created"):
+        # giờ ca đổi: lịch từ hôm nay của các nhân viên đang xếp ca này được trải lại
+        today = timezone.localdate()
+        schedule_changed(ScheduledShift.objects.filter(shift=instance, work_date__gte=today)
+                         .values_list("employee_id", flat=True).distinct(), today)
+
+
+@receiver(pre_save, sender=ShiftAssignment)
+def assignment_saving(sender, instance, **kwargs):
+    instance._old_start = ShiftAssignment.objects.filter(pk=instance.pk).values_list("start_date", flat=True).first() if instance.pk else None
+
+
+@receiver([post_save, post_delete], sender=ShiftAssignment)
+def assignment_changed(sender, instance, **kwargs):
+    # trải lại từ ngày bắt đầu sớm hơn (trước/sau khi sửa), kể cả các ngày đã qua
+    old = getattr(instance, "_old_start", None)
+    schedule_changed([instance.employee_id], min(instance.start_date, old) if old else instance.start_date)
+
+
+@receiver([post_save, pre_delete], sender=Role)
+def role_changed(sender, instance, **kwargs):
+    employees_changed(*Employee.objects.filter(role=instance).values_list("user_id", flat=True))
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or not set(update_fields) <= {"last_login"}:
+        instance._old_claims = _old_values(User, instance.pk, USER_CLAIM_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    # đổi mật khẩu, họ tên, email: token vẫn đúng
+    old = getattr(instance, "_old_claims", None)
+    if not created and old is not None and old != tuple(getattr(instance, f) for f in USER_CLAIM_FIELDS):
+        mark_claims_stale(instance.pk)
+    # tên đăng nhập nằm trong lịch sử chấm công đã lưu
+    emp_ids = list(Employee.objects.filter(user_id=instance.pk).values_list("id", flat=True))
+    if emp_ids:
+        bump_history_version(*emp_ids)
+
+
+@receiver([post_save, post_delete], sender=WorkLocation)
+def work_location_changed(sender, instance, **kwargs):
+    invalidate_geofence_index()
+    bump_history_version()
+
+
+@receiver([post_save, post_delete], sender=Attendance)
+def attendance_changed(sender, instance, **kwargs):
+    bump_monitor_version()
+    if instance.employee_id:
+        bump_history_version(instance.employee_id)
+
+
+@receiver([post_save, post_delete], sender=ArchivedMonth)
+def archive_index_changed(sender, instance, **kwargs):
+    from .archive import invalidate_archive_index
+    invalidate_archive_index()
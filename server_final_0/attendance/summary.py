@@ -0,0 +1,137 @@
+import heapq
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Employee, Attendance, DailyWorkSummary
+from .timecalc import PUNCH_FIELDS, PUNCH_ORDERING, pair_punches
+from .archive import archived_months, archived_punches
+from .caching import bump_history_version
+from .roster import load_roster, clear_roster
+
+ONE_DAY = timedelta(days=1)
+
+
+def summarize_day(slot, totals):
+    """Chuyển DayTotals của một ngày công thành các trường của DailyWorkSummary; slot là ca của ngày (roster.Slot)."""
+    return {
+        "first_in": totals.first_in,
+        "last_out": totals.last_out,
+        "worked_hours": totals.hours,
+        "late": bool(slot and totals.first_in and totals.first_in > slot.late_at),
+        "early_leave": bool(slot and totals.last_out and totals.last_out < slot.early_at),
+        "punch_count": totals.punch_count,
+    }
+
+
+def iter_punches(start, end, employee_ids=None):
+    """Luồng (employee_id, timestamp, type) theo PUNCH_ORDERING trong [start, end], gồm cả tháng đã lưu trữ."""
+    punches = Attendance.objects.filter(work_date__gte=start, work_date__lte=end, employee__isnull=False)
+    if employee_ids:
+        punches = punches.filter(employee_id__in=employee_ids)
+    rows = punches.order_by(*PUNCH_ORDERING).values_list(*PUNCH_FIELDS).iterator()
+    if not archived_months(start, end):
+        return rows
+    return heapq.merge(rows, archived_punches(start, end, employee_ids), key=lambda r: (r[0], r[1], r[2]))
+
+
+def summary_roster(employee_id, day):
+    """Lịch ca refresh_daily_summary cần cho ngày địa phương `day`; đủ để tìm ca của mọi punch trong ngày đó."""
+    return load_roster(day - 3 * ONE_DAY, day + 3 * ONE_DAY, [employee_id])
+
+
+def mark_payroll_stale(start, end):
+    # bảng công đã chốt của tháng đã kết thúc tính từ bảng này (payroll.py nhập summary nên nhập muộn)
+    from .payroll import mark_stale
+    mark_stale(start, end)
+
+
+def refresh_daily_summary(employee, day, roster=None):
+    """Cập nhật lại dòng tổng hợp của một nhân viên cho ngày `day` (gọi sau mỗi lần ghi chấm công).
+
+    `day` là ngày địa phương của punch; ngày công của ca qua đêm hôm trước/sau chạm tới ngày đó cũng được tính lại.
+    `roster`: summary_roster() của ngày đó nếu người gọi đã có.
+    """
+    if roster is None:
+        roster = summary_roster(employee.id, day)
+    days = roster.days_touching(employee.id, day)
+    totals = pair_punches(iter_punches(days[0] - ONE_DAY, days[-1] + ONE_DAY, [employee.id]), roster.work_date)
+    summary = None
+    for d in days:
+        day_totals = totals.get((employee.id, d))
+        if day_totals is None:
+            DailyWorkSummary.objects.filter(employee=employee, work_date=d).delete()
+            continue
+        row, _ = DailyWorkSummary.objects.update_or_create(
+            employee=employee, work_date=d, defaults=summarize_day(roster.slot(employee.id, d), day_totals))
+        if d == day:
+            summary = row
+    mark_payroll_stale(days[0], days[-1])
+    bump_history_version(employee.id)
+    return summary
+
+
+def rebuild_daily_summaries(start, end, employee_ids=None):
+    """Tính lại toàn bộ bảng tổng hợp cho các ngày công [start, end]. Trả về số dòng đã ghi."""
+    # punch của ngày công đầu/cuối có thể rơi vào ngày địa phương liền trước/sau (ca qua đêm)
+    roster = load_roster(start - 2 * ONE_DAY, end + 2 * ONE_DAY, employee_ids or None)
+    totals = pair_punches(iter_punches(start - ONE_DAY, end + ONE_DAY, employee_ids), roster.work_date)
+    rows = [
+        DailyWorkSummary(employee_id=emp_id, work_date=day, **summarize_day(roster.slot(emp_id, day), day_totals))
+        for (emp_id, day), day_totals in totals.items() if start <= day <= end
+    ]
+    stale = DailyWorkSummary.objects.filter(work_date__gte=start, work_date__lte=end)
+    if employee_ids:
+        stale = stale.filter(employee_id__in=employee_ids)
+    with transaction.atomic():
+        stale.delete()
+        DailyWorkSummary.objects.bulk_create(rows, batch_size=500)
+    mark_payroll_stale(start, end)
+    bump_history_version(*(employee_ids or ()))
+    return len(rows)
+
+
+def rebuild_punch_days(days, employee_ids):
+    """Tính lại các ngày công có thể chứa punch của các ngày địa phương `days` (kể cả ca qua đêm)."""
+    return rebuild_daily_summaries(min(days) - ONE_DAY, max(days) + ONE_DAY, employee_ids)
+
+
+def reschedule(employee_ids, start):
+    """Trải lại lịch ca của các nhân viên từ ngày `start` và tính lại bảng tổng hợp các ngày đã qua theo lịch mới."""
+    clear_roster(employee_ids, start)
+    today = timezone.localdate()
+    if start <= today:
+        rebuild_daily_summaries(start, today, employee_ids)
+
+
+# số dòng mỗi lần đọc từ con trỏ phía server khi xuất bảng công
+EXPORT_CHUNK_SIZE = 2000
+
+
+def iter_employee_rows(start, end, days, employees=None):
+    """Sinh (employee_id, dòng bảng công [username, họ tên, giờ từng ngày..., tổng]) cho nhân viên đang hoạt động.
+
+    `employees` (queryset Employee) giới hạn nhân viên. Đọc song song hai luồng đã sắp xếp theo nhân viên
+    (nhân viên và tổng hợp ngày) bằng iterator(), nên bộ nhớ không phụ thuộc số nhân viên.
+    """
+    summaries = DailyWorkSummary.objects.filter(employee__is_active=True, work_date__gte=start, work_date__lte=end)
+    if employees is None:
+        employees = Employee.objects.all()
+    else:
+        summaries = summaries.filter(employee__in=employees.values("id"))
+    employees = employees.filter(is_active=True)
+    employees = (employees.order_by("id").values_list("id", "user__username", "user__first_name", "user__last_name")
+                 .iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    summaries = (summaries.order_by("employee_id").values_list("employee_id", "work_date", "worked_hours")
+                 .iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    pending = next(summaries, None)
+    for emp_id, username, first_name, last_name in employees:
+        hours = {}
+        while pending is not None and pending[0] <= emp_id:
+            if pending[0] == emp_id:
+                hours[pending[1]] = pending[2]
+            pending = next(summaries, None)
+        row = [username, f"{first_name} {last_name}".strip()]
+        row.extend(round(hours.get(day, 0.0), 2) for day in days)
+        row.append(round(sum(hours.values(), 0.0), 2))
+        yield emp_id, row
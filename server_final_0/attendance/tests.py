@@ -0,0 +1,468 @@
+import glob
+import io
+import os
+import tempfile
+import uuid
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
+
+from . import metrics
+from .archive import archive_month, archived_month_index
+from .caching import claims_stale_since
+from .checks import shared_cache_check
+from .hr_import import import_employees
+from .ingest import GroupCommitQueue, replay_journal
+from .management.commands.benchmark_views import QUERY_BUDGETS
+from .models import Shift, WorkLocation, Employee, Attendance, AttendanceChangeLog, ArchivedMonth, DailyWorkSummary, PayrollSnapshot, ShiftAssignment
+from .payroll import build_snapshot, month_snapshot, snapshot_rows
+from .roster import expand_roster
+from .serializers import EmployeeTokenObtainPairSerializer
+from .summary import rebuild_daily_summaries, refresh_daily_summary
+from .utils import geofence_index, local_work_date, month_bounds
+
+
+def seed_punches(prefix, employees, days, start, shift, loc):
+    """`employees` nhân viên, mỗi người một cặp IN/OUT mỗi ngày trong `days` ngày từ `start`; một nửa đi trễ."""
+    tz = timezone.get_default_timezone()
+    rows = []
+    for i in range(employees):
+        emp = Employee.objects.create(user=User.objects.create_user(f"{prefix}{i}"), shift=shift)
+        emp.allowed_locations.add(loc)
+        for d in range(days):
+            day = start + timedelta(days=d)
+            t_in = timezone.make_aware(datetime.combine(day, time(8, 30 if i % 2 else 0)), tz)
+            for ts, t in ((t_in, "IN"), (t_in + timedelta(hours=9), "OUT")):
+                rows.append(Attendance(employee=emp, timestamp=ts, work_date=day, type=t, latitude=loc.latitude,
+                                       longitude=loc.longitude, within_geofence=True, work_location=loc))
+    Attendance.objects.bulk_create(rows, batch_size=500)
+    rebuild_daily_summaries(start, start + timedelta(days=days - 1))
+
+
+def api_client(user):
+    """APIClient mang access token của user như app Android."""
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {EmployeeTokenObtainPairSerializer.get_token(user).access_token}")
+    return client
+
+
+class DashboardQueryCountTest(TestCase):
+    """Số truy vấn của dashboard không phụ thuộc số nhân viên hay số ngày."""
+
+    def setUp(self):
+        cache.clear()
+        self.shift = Shift.objects.create(name="HC", start_time=time(8), end_time=time(17))
+        self.loc = WorkLocation.objects.create(name="HQ", latitude=10.0, longitude=106.0)
+        admin = User.objects.create_superuser("admin", "", "x")
+        self.client.force_login(admin)
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(ctx.captured_queries)
+
+    def _assert_constant(self, url, small, large):
+        seed_punches("a", *small, date(2025, 3, 3), self.shift, self.loc)
+        count = self._queries(url)
+        seed_punches("b", *large, date(2025, 3, 10), self.shift, self.loc)
+        with self.assertNumQueries(count):
+            response = self.client.get(url)
+        self.assertEqual(response.context["present"], small[0] + large[0])
+        return response
+
+    def test_day_view(self):
+        response = self._assert_constant("/web/dashboard/?view=day&date=2025-03-10", (2, 8), (20, 1))
+        self.assertEqual(response.context["late_count"], 11)
+
+    def test_year_view(self):
+        response = self._assert_constant("/web/dashboard/?view=year&date=2025-03-10", (2, 3), (15, 30))
+        self.assertEqual(len(response.context["daily_hours"]), 33)
+
+
+class QueryBudgetTest(TestCase):
+    """Các view chính không vượt QUERY_BUDGETS của benchmark_views khi cache của người dùng còn trống.
+
+    Như trong benchmark, chỉ mục địa điểm và chỉ mục tháng lưu trữ (dùng chung mọi request) đã có sẵn.
+    """
+
+    def setUp(self):
+        cache.clear()
+        today = timezone.localdate()
+        self.day, self.month = today.isoformat(), today.strftime("%Y-%m")
+        shift = Shift.objects.create(name="HC", start_time=time(8), end_time=time(17))
+        self.loc = WorkLocation.objects.create(name="HQ", latitude=10.0, longitude=106.0)
+        start = month_bounds(today)[0]
+        seed_punches("e", 5, (today - start).days + 1, start, shift, self.loc)
+        # như seed_benchmark_data: lịch ca đã trải sẵn tới hết tháng sau
+        expand_roster(None, start - timedelta(days=1), month_bounds(month_bounds(today)[1] + timedelta(days=1))[1])
+        self.emp = Employee.objects.select_related("user").order_by("id").first()
+        self.web = self.client
+        self.web.force_login(User.objects.create_superuser("admin", "", "x"))
+        self.api = api_client(self.emp.user)
+        geofence_index()
+        archived_month_index()
+
+    def assertWithinBudget(self, name, call):
+        with CaptureQueriesContext(connection) as ctx:
+            response = call()
+            if response.streaming:
+                for _chunk in response.streaming_content:
+                    pass
+        self.assertLess(response.status_code, 400, name)
+        # SAVEPOINT/RELEASE chỉ có do TestCase bọc trong transaction, benchmark không đếm BEGIN/COMMIT
+        queries = [q["sql"] for q in ctx.captured_queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+        self.assertLessEqual(len(queries), QUERY_BUDGETS[name], "\n".join(queries))
+
+    def test_api_clock(self):
+        self.assertWithinBudget("api_clock", lambda: self.api.post(
+            "/api/clock/", {"latitude": self.loc.latitude, "longitude": self.loc.longitude}, format="json"))
+
+    def test_api_history(self):
+        for period in ("day", "week", "month"):
+            with self.subTest(period=period):
+                self.assertWithinBudget(f"api_history_{period}", lambda: self.api.get(
+                    f"/api/attendance/history/?period={period}&date={self.day}"))
+
+    def test_web_dashboard(self):
+        for view in ("day", "month", "year"):
+            with self.subTest(view=view):
+                self.assertWithinBudget(f"web_dashboard_{view}",
+                                        lambda: self.web.get(f"/web/dashboard/?view={view}&date={self.day}"))
+
+    def test_web_monthly(self):
+        self.assertWithinBudget("web_monthly", lambda: self.web.get(f"/web/attendance/monthly/?month={self.month}"))
+        self.assertWithinBudget("web_monthly_rows", lambda: self.web.get(
+            f"/web/attendance/monthly/rows/?month={self.month}&after_id={self.emp.id}"))
+
+    def test_web_monthly_export(self):
+        url = f"/web/attendance/monthly/export/?month={self.month}"
+        self.assertWithinBudget("web_monthly_export_csv", lambda: self.web.get(url))
+        self.assertWithinBudget("web_monthly_export_xlsx", lambda: self.web.get(url + "&format=xlsx"))
+
+    def test_web_monitor(self):
+        self.assertWithinBudget("web_monitor", lambda: self.web.get("/web/monitor/"))
+        self.assertWithinBudget("web_monitor_feed", lambda: self.web.get("/web/monitor/feed/"))
+
+
+class ClaimsTest(TestCase):
+    """Token mang claims chỉ bị bỏ qua khi trường có trong claims đổi; không bao giờ trả 401 vì claims cũ."""
+
+    def setUp(self):
+        cache.clear()
+        self.shift = Shift.objects.create(name="HC", start_time=time(8), end_time=time(17))
+        self.loc = WorkLocation.objects.create(name="HQ", latitude=10.0, longitude=106.0)
+        self.emp = Employee.objects.create(user=User.objects.create_user("nv", password="x"), shift=self.shift)
+        self.emp.allowed_locations.add(self.loc)
+        self.api = api_client(self.emp.user)
+
+    def clock(self):
+        return self.api.post("/api/clock/", {"latitude": self.loc.latitude, "longitude": self.loc.longitude}, format="json")
+
+    def test_own_profile_edit_keeps_token(self):
+        stale_since = claims_stale_since(self.emp.user_id)
+        self.assertEqual(self.api.patch("/api/employee/me/", {"phone": "123"}, format="json").status_code, 200)
+        self.assertEqual(self.api.post("/api/employee/change-password/", {"new_password1": "y", "new_password2": "y"},
+                                       format="json").status_code, 200)
+        self.assertEqual(claims_stale_since(self.emp.user_id), stale_since)
+        self.assertEqual(self.clock().status_code, 200)
+        self.assertEqual(self.api.get("/api/attendance/history/?period=day").status_code, 200)
+
+    def test_claim_change_reads_db(self):
+        stale_since = claims_stale_since(self.emp.user_id)
+        self.emp.is_active = False
+        self.emp.save()
+        self.assertGreater(claims_stale_since(self.emp.user_id), stale_since)
+        # token còn claims employee_active=True nhưng bị bỏ qua: nhân viên đã nghỉ không chấm công được
+        self.assertEqual(self.clock().status_code, 404)
+        self.emp.is_active = True
+        self.emp.save()
+        self.assertEqual(self.clock().status_code, 200)
+
+
+class OvernightShiftTest(TestCase):
+    """IN/OUT tự động theo ca trong lịch (cố định hoặc xoay vòng): OUT sau nửa đêm của ca 22:00-06:00 đóng IN
+    của ngày công hôm trước."""
+
+    def setUp(self):
+        cache.clear()
+        self.loc = WorkLocation.objects.create(name="HQ", latitude=10.0, longitude=106.0)
+        night = Shift.objects.create(name="Đêm", start_time=time(22), end_time=time(6))
+        self.emp = Employee.objects.create(user=User.objects.create_user("nv"), shift=night)
+        self.emp.allowed_locations.add(self.loc)
+        self.api = api_client(self.emp.user)
+        self.day = timezone.localdate() - timedelta(days=2)
+        tz = timezone.get_default_timezone()
+        self.start = timezone.make_aware(datetime.combine(self.day, time(22)), tz)
+
+    def punch(self, ts):
+        return {"client_id": str(uuid.uuid4()), "timestamp": ts.isoformat(),
+                "latitude": self.loc.latitude, "longitude": self.loc.longitude, "type": None}
+
+    def assertWorked(self, hours):
+        summary = DailyWorkSummary.objects.get(employee=self.emp, work_date=self.day)
+        self.assertAlmostEqual(summary.worked_hours, hours)
+        response = self.api.get(f"/api/attendance/history/?period=day&date={self.day}")
+        self.assertAlmostEqual(response.json()["sum_hours"], hours)
+
+    def test_batch(self):
+        response = self.api.post("/api/clock/batch/", {"punches": [
+            self.punch(self.start), self.punch(self.start + timedelta(hours=8))]}, format="json")
+        self.assertEqual([r["type"] for r in response.json()["results"]], ["IN", "OUT"])
+        self.assertWorked(8)
+
+    def test_clock(self):
+        for ts, expected in ((self.start, "IN"), (self.start + timedelta(hours=8), "OUT")):
+            with mock.patch("django.utils.timezone.now", return_value=ts):
+                response = self.api.post("/api/clock/", {"latitude": self.loc.latitude,
+                                                         "longitude": self.loc.longitude}, format="json")
+            self.assertEqual(response.json()["type"], expected)
+        self.assertWorked(8)
+
+
+    def test_rotation(self):
+        # xoay vòng ca ngày/ca đêm: ngày công của mỗi punch lấy theo ca trong lịch của ngày đó
+        day = Shift.objects.create(name="Ngày", start_time=time(8), end_time=time(17))
+        night = self.emp.shift
+        ShiftAssignment.objects.create(employee=self.emp, rotation=f"{day.id},{night.id}", start_date=self.day - timedelta(days=1))
+        tz = timezone.get_default_timezone()
+        morning = timezone.make_aware(datetime.combine(self.day - timedelta(days=1), time(8)), tz)
+        response = self.api.post("/api/clock/batch/", {"punches": [
+            self.punch(morning), self.punch(morning + timedelta(hours=9)),
+            self.punch(self.start), self.punch(self.start + timedelta(hours=8))]}, format="json")
+        self.assertEqual([r["type"] for r in response.json()["results"]], ["IN", "OUT", "IN", "OUT"])
+        self.assertWorked(8)
+        previous = DailyWorkSummary.objects.get(employee=self.emp, work_date=self.day - timedelta(days=1))
+        self.assertAlmostEqual(previous.worked_hours, 9)
+        self.assertFalse(DailyWorkSummary.objects.filter(employee=self.emp, work_date=self.day + timedelta(days=1),
+                                                         punch_count__gt=0).exists())
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    def test_process_local_cache_is_an_error(self):
+        self.assertEqual(shared_cache_check(None), [])
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            self.assertEqual([e.id for e in shared_cache_check(None)], ["attendance.E001"])
+
+
+class ArchiveTest(TestCase):
+    """Tháng đã chuyển sang file lưu trữ vẫn có trong lịch sử và bảng tổng hợp."""
+
+    def setUp(self):
+        cache.clear()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        archive_dir = override_settings(ATTENDANCE_ARCHIVE_DIR=self.dir.name)
+        archive_dir.enable()
+        self.addCleanup(archive_dir.disable)
+        shift = Shift.objects.create(name="HC", start_time=time(8), end_time=time(17))
+        loc = WorkLocation.objects.create(name="HQ", latitude=10.0, longitude=106.0)
+        seed_punches("e", 1, 3, date(2025, 1, 6), shift, loc)
+        self.emp = Employee.objects.get()
+        self.api = api_client(self.emp.user)
+
+    def test_round_trip(self):
+        before = self.api.get("/api/attendance/history/?period=month&date=2025-01-06").json()
+        archived_month_index()  # chỉ mục (rỗng) đã nằm trong cache trước khi lưu trữ
+        archive_month(date(2025, 1, 1))
+        self.assertFalse(Attendance.objects.exists())
+        self.assertEqual(self.api.get("/api/attendance/history/?period=month&date=2025-01-06").json(), before)
+        self.assertEqual(before["sum_hours"], 27)
+        # tính lại ngày đã lưu trữ đọc punch từ file, không ghi đè bằng 0
+        refresh_daily_summary(self.emp, date(2025, 1, 7))
+        self.assertEqual(DailyWorkSummary.objects.get(work_date=date(2025, 1, 7)).worked_hours, 9)
+
+
+class PayrollSnapshotTest(TestCase):
+    """Snapshot hết hiệu lực khi bảng tổng hợp ngày của tháng đổi, kể cả khi không có nhật ký sửa công."""
+
+    def setUp(self):
+        cache.clear()
+        shift = Shift.objects.create(name="HC", start_time=time(8), end_time=time(17))
+        loc = WorkLocation.objects.create(name="HQ", latitude=10.0, longitude=106.0)
+        seed_punches("e", 1, 3, date(2025, 2, 3), shift, loc)
+        self.emp = Employee.objects.get()
+        self.snapshot = build_snapshot(date(2025, 2, 1), workers=1)
+
+    def total(self):
+        snapshot = month_snapshot(date(2025, 2, 1))
+        return snapshot_rows(snapshot)[0][-1] if snapshot else None
+
+    def test_timestamp_edit_without_changelog(self):
+        self.assertEqual(self.total(), 27)
+        out = Attendance.objects.filter(type="OUT").order_by("timestamp").first()
+        out.timestamp -= timedelta(hours=1)
+        out.save()
+        refresh_daily_summary(self.emp, out.work_date)
+        # hết hiệu lực nhưng không tính lại trong request: xem trực tiếp từ bảng tổng hợp
+        self.assertIsNone(self.total())
+        self.assertEqual(PayrollSnapshot.objects.count(), 1)
+        call_command("snapshot_payroll", month=["2025-02"], workers=1, stdout=io.StringIO())
+        self.assertEqual(self.total(), 26)
+
+    def test_rebuild_and_current_month(self):
+        refresh_daily_summary(self.emp, timezone.localdate())
+        self.assertEqual(self.total(), 27)
+        rebuild_daily_summaries(date(2025, 2, 1), date(2025, 2, 28))
+        self.assertIsNone(self.total())
+
+
+class ClockSyncTest(TestCase):
+    """Chấm công gửi lại (Idempotency-Key) và đồng bộ offline theo lô: gửi lại, client_id của nhân viên khác,
+    punch quá cũ hoặc thuộc tháng đã lưu trữ."""
+
+    def setUp(self):
+        cache.clear()
+        shift = Shift.objects.create(name="HC", start_time=time(8), end_time=time(17))
+        self.loc = WorkLocation.objects.create(name="HQ", latitude=10.0, longitude=106.0)
+        self.emp = Employee.objects.create(user=User.objects.create_user("nv"), shift=shift)
+        self.emp.allowed_locations.add(self.loc)
+        self.api = api_client(self.emp.user)
+
+    def punch(self, ts):
+        return {"client_id": str(uuid.uuid4()), "timestamp": ts.isoformat(),
+                "latitude": self.loc.latitude, "longitude": self.loc.longitude}
+
+    def sync(self, *punches):
+        return self.api.post("/api/clock/batch/", {"punches": list(punches)}, format="json").json()
+
+    def test_clock_replay(self):
+        data = {"latitude": self.loc.latitude, "longitude": self.loc.longitude}
+        first = self.api.post("/api/clock/", data, format="json", HTTP_IDEMPOTENCY_KEY="k1").json()
+        self.assertEqual(self.api.post("/api/clock/", data, format="json", HTTP_IDEMPOTENCY_KEY="k1").json(), first)
+        # phản hồi đã lưu bị mất (cache hết hạn, worker khác): trả lời từ punch đã ghi
+        cache.clear()
+        again = self.api.post("/api/clock/", data, format="json", HTTP_IDEMPOTENCY_KEY="k1").json()
+        self.assertEqual(again, first)
+        self.assertEqual(Attendance.objects.count(), 1)
+
+    def test_replay_counted_once(self):
+        metrics.reset()
+        data = {"latitude": self.loc.latitude, "longitude": self.loc.longitude}
+        for clear in (False, False, True):
+            if clear:
+                cache.clear()  # phản hồi đã lưu bị mất: trả lời từ punch đã ghi
+            self.api.post("/api/clock/", data, format="json", HTTP_IDEMPOTENCY_KEY="k1")
+        self.assertIn('attendance_punches_total{result="accepted"} 1\n', metrics.render())
+
+    def test_batch_retry_and_conflict(self):
+        start = timezone.now() - timedelta(days=1)
+        punches = [self.punch(start), self.punch(start + timedelta(hours=8))]
+        self.assertEqual([r["type"] for r in self.sync(*punches)["results"]], ["IN", "OUT"])
+        retry = self.sync(*punches)
+        self.assertEqual(retry["accepted"], 0)
+        self.assertEqual([(r["duplicate"], r["type"]) for r in retry["results"]], [(True, "IN"), (True, "OUT")])
+        other = Employee.objects.create(user=User.objects.create_user("nv2"))
+        other.allowed_locations.add(self.loc)
+        conflict = api_client(other.user).post("/api/clock/batch/", {"punches": punches[:1]}, format="json").json()
+        self.assertTrue(conflict["results"][0]["conflict"])
+        self.assertEqual(Attendance.objects.filter(employee=self.emp).count(), 2)
+        self.assertFalse(Attendance.objects.filter(employee=other).exists())
+
+    def test_batch_rejects_old_and_archived(self):
+        now = timezone.now()
+        old = self.sync(self.punch(now - timedelta(days=settings.ATTENDANCE_OFFLINE_MAX_AGE_DAYS, hours=1)))
+        self.assertFalse(old["results"][0]["ok"])
+        recent = now - timedelta(days=1)
+        ArchivedMonth.objects.create(month=local_work_date(recent).replace(day=1), path="x.arc", checksum="0" * 64)
+        archived = self.sync(self.punch(recent))
+        self.assertEqual(archived["results"][0]["message"], "Tháng này đã được lưu trữ.")
+        self.assertFalse(Attendance.objects.exists())
+
+
+class GroupCommitTest(TestCase):
+    """Ghi theo lô: punch nằm trong nhật ký tới khi flush; replay nhật ký không tạo bản ghi trùng."""
+
+    def setUp(self):
+        cache.clear()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        shift = Shift.objects.create(name="HC", start_time=time(8), end_time=time(17))
+        self.loc = WorkLocation.objects.create(name="HQ", latitude=10.0, longitude=106.0)
+        self.emp = Employee.objects.create(user=User.objects.create_user("nv"), shift=shift)
+        tz = timezone.get_default_timezone()
+        self.day = date(2025, 3, 4)
+        self.start = timezone.make_aware(datetime.combine(self.day, time(8)), tz)
+
+    def punches(self):
+        return [Attendance(employee=self.emp, type=t, timestamp=ts, work_date=self.day, client_id=uuid.uuid4(),
+                           latitude=10.0, longitude=106.0, work_location=self.loc)
+                for t, ts in (("IN", self.start), ("OUT", self.start + timedelta(hours=9)))]
+
+    def journal(self):
+        return glob.glob(os.path.join(self.dir.name, "punch-*.log"))
+
+    def test_flush(self):
+        queue = GroupCommitQueue(self.dir.name)
+        for att in self.punches():
+            queue.submit(att)
+        self.assertFalse(Attendance.objects.exists())
+        self.assertEqual(len(self.journal()), 1)
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual(self.journal(), [])
+        self.assertEqual(DailyWorkSummary.objects.get(employee=self.emp, work_date=self.day).worked_hours, 9)
+
+    def test_replay_after_partial_commit(self):
+        queue = GroupCommitQueue(self.dir.name)
+        punches = self.punches()
+        for att in punches:
+            queue.submit(att)
+        queue._file.write(b'{"employee_id":')  # dòng ghi dở khi mất điện
+        queue._file.close()
+        Attendance.objects.bulk_create(punches[:1])  # lô đã commit một phần trước khi tiến trình dừng
+        self.assertEqual(replay_journal(self.dir.name), 2)
+        self.assertEqual(self.journal(), [])
+        self.assertEqual(Attendance.objects.filter(employee=self.emp).count(), 2)
+        self.assertEqual(DailyWorkSummary.objects.get(employee=self.emp, work_date=self.day).worked_hours, 9)
+
+
+class ChangeLogTest(TestCase):
+    """Sửa công trên web chỉ lưu các trường thay đổi {"trường": [cũ, mới]} và hiện trong nhật ký sửa công."""
+
+    def setUp(self):
+        cache.clear()
+        shift = Shift.objects.create(name="HC", start_time=time(8), end_time=time(17))
+        loc = WorkLocation.objects.create(name="HQ", latitude=10.0, longitude=106.0)
+        seed_punches("e", 1, 1, date(2025, 4, 7), shift, loc)
+        self.out = Attendance.objects.get(type="OUT")
+        self.client.force_login(User.objects.create_superuser("admin", "", "x"))
+
+    def edit(self, timestamp, **extra):
+        data = {"type": self.out.type, "timestamp": timestamp, "latitude": self.out.latitude,
+                "longitude": self.out.longitude, "work_location_id": self.out.work_location_id,
+                "note": self.out.note, **extra}
+        self.client.post(f"/web/attendance/{self.out.pk}/edit/", data)
+
+    def test_diff(self):
+        old = self.out.timestamp
+        self.edit("2025-04-07 16:00", reason="quên chấm")
+        self.edit("2025-04-07 16:00")  # lưu lại không đổi gì
+        edited, unchanged = AttendanceChangeLog.objects.filter(action="edited").order_by("id")
+        new = Attendance.objects.get(pk=self.out.pk).timestamp
+        self.assertEqual(list(edited.changes_dict), ["timestamp"])
+        self.assertEqual([parse_datetime(v) for v in edited.changes_dict["timestamp"]], [old, new])
+        self.assertEqual(unchanged.changes, "")
+        self.assertEqual(DailyWorkSummary.objects.get(work_date=date(2025, 4, 7)).worked_hours, 8)
+        response = self.client.get(f"/web/attendance/audit/?attendance={self.out.pk}")
+        self.assertContains(response, "quên chấm")
+        self.assertContains(response, "<code>timestamp</code>")
+
+
+class EmployeeImportTest(TestCase):
+    def test_bad_location_ids_are_row_errors(self):
+        loc = WorkLocation.objects.create(name="HQ", latitude=10.0, longitude=106.0)
+        data = "username,work_location_id\n" + "".join(
+            f"nv{i},{value}\n" for i, value in enumerate(["inf", "1e999", "nan", "1.5", "abc", f"{loc.id}.0"]))
+        created, errors = import_employees(io.BytesIO(data.encode()), "nv.csv")
+        self.assertEqual(created, 1)
+        self.assertEqual([line for line, _ in errors], [2, 3, 4, 5, 6])
+        self.assertEqual(list(Employee.objects.get().allowed_locations.all()), [loc])
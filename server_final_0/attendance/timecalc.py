@@ -0,0 +1,54 @@
+from collections import deque
+from .utils import local_work_date
+
+# Thứ tự cột của luồng chấm công đưa vào bộ ghép cặp
+PUNCH_FIELDS = ("employee_id", "timestamp", "type")
+# IN đứng trước OUT khi trùng thời điểm (ghép được cặp thời lượng 0)
+PUNCH_ORDERING = ("employee_id", "timestamp", "type")
+
+
+class DayTotals:
+    """Kết quả ghép cặp IN/OUT của một nhân viên trong một ngày."""
+    __slots__ = ("hours", "first_in", "last_out", "punch_count", "_open_ins")
+
+    def __init__(self):
+        self.hours = 0.0
+        self.first_in = None
+        self.last_out = None
+        self.punch_count = 0
+        self._open_ins = deque()
+
+    def add(self, ts, type_):
+        self.punch_count += 1
+        if type_ == "IN":
+            if self.first_in is None:
+                self.first_in = ts
+            self._open_ins.append(ts)
+        elif type_ == "OUT":
+            self.last_out = ts
+            # ghép với IN sớm nhất chưa có cặp; OUT không có IN trước đó thì bỏ qua
+            if self._open_ins:
+                self.hours += max(0.0, (ts - self._open_ins.popleft()).total_seconds()/3600.0)
+
+
+def pair_punches(rows, day_of=None):
+    """Ghép cặp IN/OUT trong một lượt duyệt.
+
+    `rows` là luồng bộ (employee_id, timestamp, type) cho bất kỳ số nhân viên/ngày nào,
+    đã sắp xếp theo PUNCH_ORDERING (ví dụ `qs.order_by(*PUNCH_ORDERING).values_list(*PUNCH_FIELDS)`).
+    `day_of(employee_id, timestamp)` cho ngày công của punch (ví dụ RosterIndex.work_date để ca qua đêm
+    không bị cắt ở nửa đêm); mặc định là ngày địa phương. Trả về {(employee_id, ngày): DayTotals}.
+    """
+    totals = {}
+    for emp_id, ts, type_ in rows:
+        key = (emp_id, day_of(emp_id, ts) if day_of else local_work_date(ts))
+        day = totals.get(key)
+        if day is None:
+            day = totals[key] = DayTotals()
+        day.add(ts, type_)
+    return totals
+
+
+def daily_hours(rows):
+    """{(employee_id, ngày): số giờ làm} từ luồng chấm công (xem pair_punches)."""
+    return {key: day.hours for key, day in pair_punches(rows).items()}
@@ -5,8 +5,10 @@ from . import views
 urlpatterns = [
     path('web/login/', views.web_login, name='web_login'),
     path('web/logout/', views.web_logout, name='web_logout'),
+    path('metrics', views.metrics_view, name='metrics'),
     # API for mobile
     path('api/clock/', views.api_clock, name='api_clock'),
+    path('api/clock/batch/', views.api_clock_batch, name='api_clock_batch'),
     path('api/attendance/history/', views.api_history, name='api_history'),
     path('api/employee/me/', views.api_employee_me, name='api_employee_me'),
     path('api/employee/change-password/', views.api_change_password, name='api_change_password'),
@@ -14,8 +16,12 @@ urlpatterns = [
     # Web dashboard & management
     path('web/dashboard/', views.web_dashboard, name='web_dashboard'),
     path('web/monitor/', views.web_monitor, name='web_monitor'),
+    path('web/monitor/feed/', views.web_monitor_feed, name='web_monitor_feed'),
 
     path('web/employees/', views.web_employees, name='web_employees'),
+    path('web/employees/import/', views.web_employee_import, name='hr_import'),
+    path('web/employees/bulk/', views.web_employee_bulk, name='web_employee_bulk'),
+    path('web/employees/bulk/jobs/<str:job_id>/', views.web_employee_bulk_job, name='web_employee_bulk_job'),
     path('web/employees/new/', views.web_employee_new, name='web_employee_new'),
     path('web/employees/<int:pk>/edit/', views.web_employee_edit, name='web_employee_edit'),
     path('web/employees/<int:pk>/toggle/', views.web_employee_toggle, name='web_employee_toggle'),
@@ -26,6 +32,8 @@ urlpatterns = [
 
     path('web/attendance/<int:pk>/edit/', views.web_attendance_edit, name='web_attendance_edit'),
     path('web/attendance/new/', views.web_attendance_new, name='web_attendance_new'),
+    path('web/attendance/audit/', views.web_attendance_audit, name='web_attendance_audit'),
     path('web/attendance/monthly/', views.web_monthly, name='web_monthly'),
+    path('web/attendance/monthly/rows/', views.web_monthly_rows, name='web_monthly_rows'),
     path('web/attendance/monthly/export/', views.web_monthly_export, name='web_monthly_export'),
 ]
@@ -1,6 +1,7 @@
 
 import math
 from datetime import datetime, timedelta, date, time
+from django.utils import timezone
 
 def haversine_m(lat1, lon1, lat2, lon2):
     R = 6371000.0
@@ -12,6 +13,10 @@ def haversine_m(lat1, lon1, lat2, lon2):
     c = 2*math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return R * c
 
+def local_work_date(ts):
+    # ngày làm việc theo giờ địa phương (TIME_ZONE), không phụ thuộc timezone đang kích hoạt
+    return timezone.localdate(ts, timezone.get_default_timezone())
+
 def week_bounds(d: date):
     start = d - timedelta(days=d.weekday())
     end = start + timedelta(days=6)
@@ -24,3 +29,97 @@ def month_bounds(d: date):
     else:
         end = start.replace(month=start.month+1, day=1) - timedelta(days=1)
     return start, end
+
+def haversine_many(lat, lon, points):
+    # khoảng cách (m) từ (lat, lon) tới nhiều điểm (lat2, lon2) một lượt
+    R = 6371000.0
+    phi1 = math.radians(lat)
+    cos_phi1 = math.cos(phi1)
+    lam1 = math.radians(lon)
+    out = []
+    for lat2, lon2 in points:
+        phi2 = math.radians(lat2)
+        a = math.sin((phi2 - phi1)/2)**2 + cos_phi1*math.cos(phi2)*math.sin((math.radians(lon2) - lam1)/2)**2
+        out.append(2*R*math.asin(min(1.0, math.sqrt(a))))
+    return out
+
+
+# ---------------- Geofence -----------------
+
+GEOFENCE_CELL_DEG = 0.01          # ô lưới ~1.1 km
+GEOFENCE_DIRECT_MAX = 16          # ít địa điểm được phép thì tính trực tiếp, không cần dò lưới
+GEOFENCE_MAX_RING = 3             # dò quá số vòng này mà chưa thấy thì tính trên toàn bộ ứng viên
+GEOFENCE_VERSION_KEY = "geofence-index-version"
+
+
+class GeofenceIndex:
+    """Chỉ mục lưới (theo độ) của toàn bộ WorkLocation, giữ trong bộ nhớ tiến trình."""
+
+    def __init__(self, locations):
+        self.by_id = {}
+        self.cells = {}
+        for loc in locations:
+            self.by_id[loc.id] = loc
+            self.cells.setdefault(self._cell(loc.latitude, loc.longitude), []).append(loc)
+
+    @staticmethod
+    def _cell(lat, lon):
+        return (int(math.floor(lat / GEOFENCE_CELL_DEG)), int(math.floor(lon / GEOFENCE_CELL_DEG)))
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+    def _closest(self, lat, lon, candidates):
+        if not candidates:
+            return None, None
+        distances = haversine_many(lat, lon, [(c.latitude, c.longitude) for c in candidates])
+        best = min(range(len(candidates)), key=distances.__getitem__)
+        return candidates[best], distances[best]
+
+    def _ring(self, ci, cj, ring):
+        if ring == 0:
+            return [(ci, cj)]
+        cells = [(ci + d, cj + e) for d in (-ring, ring) for e in range(-ring, ring + 1)]
+        cells += [(ci + d, cj + e) for e in (-ring, ring) for d in range(-ring + 1, ring)]
+        return cells
+
+    def nearest(self, lat, lon, allowed_ids=None):
+        """Địa điểm gần nhất (trong allowed_ids nếu có) và khoảng cách (m); (None, None) nếu không có."""
+        if allowed_ids is not None and len(allowed_ids) <= GEOFENCE_DIRECT_MAX:
+            return self._closest(lat, lon, [self.by_id[i] for i in allowed_ids if i in self.by_id])
+        allowed = set(allowed_ids) if allowed_ids is not None else None
+        ci, cj = self._cell(lat, lon)
+        # cạnh ngắn nhất của một ô (m): mọi ô ngoài vòng k cách điểm ít nhất k * cell_m
+        cell_m = GEOFENCE_CELL_DEG * 111320.0 * max(0.01, math.cos(math.radians(min(89.0, abs(lat) + GEOFENCE_MAX_RING * GEOFENCE_CELL_DEG))))
+        best, best_d = None, None
+        for ring in range(GEOFENCE_MAX_RING + 1):
+            candidates = [loc for cell in self._ring(ci, cj, ring) for loc in self.cells.get(cell, ())
+                          if allowed is None or loc.id in allowed]
+            loc, d = self._closest(lat, lon, candidates)
+            if loc is not None and (best_d is None or d < best_d):
+                best, best_d = loc, d
+            if best_d is not None and best_d <= ring * cell_m:
+                return best, best_d
+        # xa mọi địa điểm trong lưới gần: so trên toàn bộ ứng viên
+        candidates = [loc for loc in self.by_id.values() if allowed is None or loc.id in allowed]
+        return self._closest(lat, lon, candidates)
+
+
+_geofence = {"index": None, "version": None}
+
+
+def invalidate_geofence_index():
+    # gọi sau khi thêm/sửa/xóa WorkLocation; các tiến trình khác thấy phiên bản mới qua cache
+    from django.core.cache import cache
+    cache.set(GEOFENCE_VERSION_KEY, datetime.now().timestamp(), None)
+    _geofence["index"] = None
+
+
+def geofence_index():
+    from django.core.cache import cache
+    from .models import WorkLocation
+    version = cache.get(GEOFENCE_VERSION_KEY)
+    if _geofence["index"] is None or _geofence["version"] != version:
+        _geofence["index"] = GeofenceIndex(WorkLocation.objects.all())
+        _geofence["version"] = version
+    return _geofence["index"]
@@ -1,39 +1,70 @@
 
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
-from django.db.models import Count, Q, Min, Max
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse, Http404
+from django.db import transaction, IntegrityError
+from django.db.models import Count, Q, Max, Sum, Subquery
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
 from datetime import date, datetime, time, timedelta
+from functools import partial
 import io
 import csv
+import hashlib
+import itertools
+import time as _time
+import uuid
 
-from .models import Department, Position, Role, WorkLocation, Shift, Employee, Attendance, AttendanceChangeLog
+from .models import Department, Position, Role, WorkLocation, Shift, Employee, Attendance, AttendanceChangeLog, DailyWorkSummary
 from .serializers import (
-    EmployeeMeSerializer, EmployeeSerializer, AttendanceSerializer, WorkLocationSerializer, ShiftSerializer
+    EmployeeMeSerializer, EmployeeSerializer, AttendanceSerializer, WorkLocationSerializer, ShiftSerializer,
+    ATTENDANCE_ITEM_FIELDS, ATTENDANCE_ITEM_COLUMNS, parse_fields, location_data, attendance_items,
+)
+from .utils import haversine_m, week_bounds, month_bounds, local_work_date, geofence_index
+from .archive import archived_months, archived_attendances, archived_month_index
+from .summary import refresh_daily_summary, summary_roster, rebuild_punch_days, iter_employee_rows
+from .roster import load_roster
+from .payroll import month_snapshot, snapshot_rows, snapshot_by_username
+from .xlsx import iter_xlsx, XLSX_CONTENT_TYPE
+from .authentication import EmployeeClaimsAuthentication
+from .ingest import group_commit_enabled, submit_punch
+from .hr_import import IMPORT_COLUMNS, ImportFileError, import_employees
+from . import metrics
+from .geofence import start_reevaluation
+from .bulk import UNCHANGED, select_employees, bulk_update_employees, start_password_reset, job_progress
+from .caching import (
+    clock_client_id, get_idempotent_response, remember_idempotent_response,
+    next_clock_type, set_clock_state, invalidate_clock_state, get_clocking_context,
+    bump_monitor_version, monitor_version, get_history_payload, set_history_payload,
 )
-from .utils import haversine_m, week_bounds, month_bounds
 
 
 def user_has_role(user, *roles):
     if user.is_superuser:
         return True
-    try:
-        emp = user.employee
-    except Exception:
-        return False
-    if emp.role and emp.role.name in roles:
+    # role name from the JWT claims, else from the cached clocking context
+    role = getattr(user, "role_name", None) or get_clocking_context(user.pk)["role"]
+    if role and role in roles:
         return True
     return False
 
+def request_employee_id(request):
+    # employee id from the JWT claims, else from the cached clocking context
+    return getattr(request.user, "employee_id", None) or get_clocking_context(request.user.pk)["employee_id"]
+
 def require_roles(*roles):
     def _decorator(view_func):
         def _wrapped(request, *args, **kwargs):
@@ -46,48 +77,226 @@ def require_roles(*roles):
         return _wrapped
     return _decorator
 
+def metrics_view(request):
+    """Số đo request/SQL và bộ đếm chấm công cho Prometheus."""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponseForbidden("Bạn không có quyền truy cập chức năng này.")
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 # ---------------- API -----------------
 
+def resolve_work_location(geofence, allowed_ids, lat, lon, work_location_id=None):
+    """(địa điểm, khoảng cách m, thông báo lỗi) cho một lần chấm công; Http404 nếu địa điểm không tồn tại."""
+    if work_location_id is None:
+        # default: nearest of the employee's allowed locations
+        loc, distance = geofence.nearest(lat, lon, allowed_ids)
+        if not loc:
+            return None, None, "Bạn chưa được cấu hình địa điểm chấm công."
+        return loc, distance, None
+    loc = geofence.get(int(work_location_id))
+    if loc is None:
+        raise Http404
+    # Validate that location is allowed for employee
+    if loc.pk not in allowed_ids:
+        return None, None, "Địa điểm này không thuộc phạm vi được phép."
+    return loc, haversine_m(lat, lon, loc.latitude, loc.longitude), None
+
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([EmployeeClaimsAuthentication])
 @permission_classes([IsAuthenticated])
 def api_clock(request):
-    emp = get_object_or_404(Employee, user=request.user, is_active=True)
+    # Idempotency-Key header / client_id: a replayed request gets the original response
+    try:
+        client_id = clock_client_id(request.user.pk, request.headers.get("Idempotency-Key"), request.data.get("client_id"))
+    except ValueError:
+        return Response({"ok": False, "message": "client_id không hợp lệ."}, status=400)
+    if client_id:
+        replay = get_idempotent_response(request.user.pk, client_id)
+        if replay is not None:
+            return Response(replay)
+
+    # employee, shift and allowed locations come from the cached clocking context
+    ctx = get_clocking_context(request.user.pk)
+    if not ctx["employee_id"] or not ctx["is_active"]:
+        raise Http404
+    emp = Employee(id=ctx["employee_id"], user_id=request.user.pk, shift=ctx["shift"], is_active=True)
     lat = float(request.data.get("latitude"))
     lon = float(request.data.get("longitude"))
     t = request.data.get("type")  # may be None -> auto
     work_location_id = request.data.get("work_location_id")
-    if work_location_id is None:
-        # default: if employee has 1 allowed location use it
-        loc = emp.allowed_locations.first()
-        if not loc:
-            return Response({"ok": False, "message": "Bạn chưa được cấu hình địa điểm chấm công."}, status=400)
-    else:
-        loc = get_object_or_404(WorkLocation, pk=work_location_id)
-
-    # Validate that location is allowed for employee
-    if not emp.allowed_locations.filter(pk=loc.pk).exists():
-        return Response({"ok": False, "message": "Địa điểm này không thuộc phạm vi được phép."}, status=400)
-
-    distance = haversine_m(lat, lon, loc.latitude, loc.longitude)
+    loc, distance, error = resolve_work_location(geofence_index(), ctx["allowed_location_ids"], lat, lon, work_location_id)
+    if error:
+        metrics.count_punch("rejected_location")
+        return Response({"ok": False, "message": error}, status=400)
     within = distance <= loc.radius_m
 
-    # resolve type automatically
+    # resolve type automatically from the cached last punch and the shift it belongs to:
+    # the OUT after midnight of an overnight shift closes the IN of the previous work day
+    now = timezone.now()
+    roster = None
     if t not in ["IN","OUT"]:
-        today = timezone.localdate()
-        last_in = Attendance.objects.filter(employee=emp, type="IN", timestamp__date=today).order_by("-timestamp").first()
-        last_out = Attendance.objects.filter(employee=emp, type="OUT", timestamp__date=today).order_by("-timestamp").first()
-        t = "OUT" if last_in and (not last_out or last_in.timestamp > last_out.timestamp) else "IN"
-
-    att = Attendance.objects.create(
-        employee=emp, type=t, latitude=lat, longitude=lon,
-        distance_m=round(distance,2), within_geofence=within, work_location=loc, created_by=request.user
-    )
+        roster = summary_roster(emp.id, local_work_date(now))
+        t = next_clock_type(emp.id, now, partial(roster.work_date, emp.id))
+
+    if group_commit_enabled():
+        # ghi theo lô: xác nhận khi punch đã vào nhật ký trên đĩa, thread nền INSERT sau vài chục ms
+        att = Attendance(
+            employee=emp, timestamp=now, work_date=local_work_date(now), type=t, latitude=lat, longitude=lon,
+            distance_m=round(distance,2), within_geofence=within, work_location=loc,
+            client_id=client_id or uuid.uuid4(), created_by_id=request.user.pk
+        )
+        submit_punch(att)
+        metrics.count_punch("accepted" if within else "outside_geofence")
+        set_clock_state(emp.id, att.type, att.timestamp)
+        payload = clock_response(att, loc)
+        if client_id:
+            remember_idempotent_response(request.user.pk, client_id, payload)
+        return Response(payload)
 
-    return Response({
-        "ok": True, "within_geofence": within, "distance_m": round(distance,2), "type": t,
+    try:
+        with transaction.atomic():
+            att = Attendance.objects.create(
+                employee=emp, timestamp=now, type=t, latitude=lat, longitude=lon,
+                distance_m=round(distance,2), within_geofence=within, work_location=loc,
+                client_id=client_id, created_by_id=request.user.pk
+            )
+    except IntegrityError:
+        # cache miss but already stored (expired entry or another worker): answer from the stored punch
+        att = Attendance.objects.select_related("work_location").filter(client_id=client_id, employee=emp).first()
+        if att is None:
+            return Response({"ok": False, "message": "client_id đã được sử dụng."}, status=409)
+        payload = clock_response(att, att.work_location)
+        remember_idempotent_response(request.user.pk, client_id, payload)
+        return Response(payload)
+    # đếm sau khi ghi: request gửi lại (trả từ cache hoặc từ punch đã lưu) không được đếm lần nữa
+    metrics.count_punch("accepted" if within else "outside_geofence")
+    set_clock_state(emp.id, att.type, att.timestamp)
+    refresh_daily_summary(emp, att.work_date, roster)
+
+    payload = clock_response(att, loc)
+    if client_id:
+        remember_idempotent_response(request.user.pk, client_id, payload)
+    return Response(payload)
+
+
+def clock_response(att, loc):
+    return {
+        "ok": True, "within_geofence": att.within_geofence, "distance_m": att.distance_m, "type": att.type,
         "timestamp": att.timestamp, "work_location": WorkLocationSerializer(loc).data
-    })
+    }
+
+
+CLOCK_BATCH_MAX = 500                      # số punch tối đa trong một lần đồng bộ
+CLOCK_MAX_FUTURE_SKEW = timedelta(minutes=5)
+
+
+@api_view(["POST"])
+@authentication_classes([EmployeeClaimsAuthentication])
+@permission_classes([IsAuthenticated])
+def api_clock_batch(request):
+    """Đồng bộ nhiều lần chấm công offline trong một request (mỗi punch có client_id UUID do thiết bị sinh)."""
+    ctx = get_clocking_context(request.user.pk)
+    if not ctx["employee_id"] or not ctx["is_active"]:
+        raise Http404
+    emp = Employee(id=ctx["employee_id"], user_id=request.user.pk, shift=ctx["shift"], is_active=True)
+    punches = request.data.get("punches") if isinstance(request.data, dict) else request.data
+    if not isinstance(punches, list):
+        return Response({"ok": False, "message": "Dữ liệu phải là danh sách punches."}, status=400)
+    if len(punches) > CLOCK_BATCH_MAX:
+        return Response({"ok": False, "message": f"Tối đa {CLOCK_BATCH_MAX} lần chấm công mỗi lần đồng bộ."}, status=400)
+
+    allowed_ids = ctx["allowed_location_ids"]
+    geofence = geofence_index()
+    now = timezone.now()
+    oldest = now - timedelta(days=settings.ATTENDANCE_OFFLINE_MAX_AGE_DAYS)
+    archived = archived_month_index()
+    results = [None] * len(punches)
+    valid = []  # (index, client_id, timestamp, type, lat, lon, loc, distance)
+    seen = set()
+    for idx, item in enumerate(punches):
+        client_id = item.get("client_id") if isinstance(item, dict) else None
+        try:
+            client_id = uuid.UUID(str(client_id))
+            lat = float(item.get("latitude"))
+            lon = float(item.get("longitude"))
+            ts = parse_datetime(item["timestamp"]) if item.get("timestamp") else now
+            if ts is None:
+                raise ValueError
+            if timezone.is_naive(ts):
+                ts = timezone.make_aware(ts)
+            loc, distance, error = resolve_work_location(geofence, allowed_ids, lat, lon, item.get("work_location_id"))
+        except (TypeError, ValueError, KeyError):
+            results[idx] = {"client_id": str(client_id) if client_id else None, "ok": False, "message": "Dữ liệu không hợp lệ."}
+            continue
+        except Http404:
+            error = "Địa điểm không tồn tại."
+        if not error and ts > now + CLOCK_MAX_FUTURE_SKEW:
+            error = "Thời gian chấm công ở tương lai."
+        if not error and ts < oldest:
+            error = f"Thời gian chấm công cũ hơn {settings.ATTENDANCE_OFFLINE_MAX_AGE_DAYS} ngày."
+        # tháng đã chuyển sang file lưu trữ không nhận punch mới vào bảng chính
+        if not error and local_work_date(ts).replace(day=1) in archived:
+            error = "Tháng này đã được lưu trữ."
+        if not error and client_id in seen:
+            error = "client_id bị trùng trong cùng lần đồng bộ."
+        if error:
+            results[idx] = {"client_id": str(client_id), "ok": False, "message": error}
+            continue
+        seen.add(client_id)
+        t = item.get("type")
+        valid.append([idx, client_id, ts, t if t in ["IN","OUT"] else None, lat, lon, loc, distance])
+
+    # punches already synced (client retry) are acknowledged, not written again;
+    # a client_id stored for another employee is a conflict, never that employee's punch
+    existing = {cid: (emp_id, t) for cid, emp_id, t in
+                Attendance.objects.filter(client_id__in=[v[1] for v in valid]).values_list("client_id", "employee_id", "type")}
+    fresh = []
+    for v in valid:
+        if v[1] not in existing:
+            fresh.append(v)
+        elif existing[v[1]][0] != emp.id:
+            results[v[0]] = {"client_id": str(v[1]), "ok": False, "conflict": True, "message": "client_id đã được sử dụng."}
+        else:
+            results[v[0]] = {"client_id": str(v[1]), "ok": True, "duplicate": True, "type": existing[v[1]][1]}
+
+    # resolve type automatically, in time order, continuing from the last stored punch of each work day;
+    # work days follow the roster so an overnight shift's OUT after midnight closes the previous day's IN
+    fresh.sort(key=lambda v: v[2])
+    days = {local_work_date(v[2]) for v in fresh}
+    last_type, work_date = {}, None
+    if any(v[3] is None for v in fresh):
+        roster = load_roster(min(days) - timedelta(days=1), max(days) + timedelta(days=1), [emp.id])
+        work_date = partial(roster.work_date, emp.id)
+        for ts, t in (Attendance.objects.filter(employee=emp, work_date__gte=min(days) - timedelta(days=1),
+                                                work_date__lte=max(days) + timedelta(days=1))
+                      .order_by("timestamp").values_list("timestamp", "type")):
+            last_type[work_date(ts)] = t
+    rows = []
+    for idx, client_id, ts, t, lat, lon, loc, distance in fresh:
+        day = local_work_date(ts)
+        if work_date is not None:
+            shift_day = work_date(ts)
+            if t is None:
+                t = "OUT" if last_type.get(shift_day) == "IN" else "IN"
+            last_type[shift_day] = t
+        within = distance <= loc.radius_m
+        rows.append(Attendance(
+            employee=emp, timestamp=ts, work_date=day, type=t, latitude=lat, longitude=lon,
+            distance_m=round(distance,2), within_geofence=within, work_location=loc,
+            client_id=client_id, created_by_id=request.user.pk
+        ))
+        results[idx] = {"client_id": str(client_id), "ok": True, "duplicate": False, "type": t, "timestamp": ts,
+                        "within_geofence": within, "distance_m": round(distance,2), "work_location_id": loc.pk}
+
+    if rows:
+        with transaction.atomic():
+            # ignore_conflicts: a concurrent retry of the same punch is dropped by the unique client_id
+            Attendance.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+            rebuild_punch_days(days, [emp.id])
+        invalidate_clock_state(emp.id)
+        bump_monitor_version()
+
+    return Response({"ok": True, "accepted": len(rows), "results": results})
 
 
 @api_view(["GET","PATCH"])
@@ -126,11 +335,14 @@ def api_change_password(request):
     request.user.save()
     return Response({"ok": True})
 
+@gzip_page
 @api_view(["GET"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([EmployeeClaimsAuthentication])
 @permission_classes([IsAuthenticated])
 def api_history(request):
-    emp = get_object_or_404(Employee, user=request.user)
+    emp_id = request_employee_id(request)
+    if not emp_id:
+        raise Http404
     period = request.GET.get("period", "day")
     date_str = request.GET.get("date")
     if date_str:
@@ -146,68 +358,93 @@ def api_history(request):
     elif period == "month":
         start, end = month_bounds(base_date)
     else:
+        period = "day"
         start = base_date
         end = base_date
 
-    qs = Attendance.objects.filter(employee=emp, timestamp__date__gte=start, timestamp__date__lte=end).order_by("timestamp")
+    # ?compact=1: punch là mảng giá trị theo "fields", địa điểm tra trong bảng "locations"; ?fields=a,b chỉ lấy các trường này
+    compact = request.GET.get("compact") in ("1", "true")
+    try:
+        fields = parse_fields(request.GET.get("fields"), ATTENDANCE_ITEM_FIELDS,
+                              default=HISTORY_COMPACT_FIELDS if compact else None)
+    except ValueError as e:
+        return Response({"ok": False, "message": f"Trường không hợp lệ: {e}"}, status=400)
+
+    # payload đã render được lưu theo (nhân viên, kỳ, ngày đầu, dạng); mọi lần ghi chấm công của nhân viên đổi khóa
+    variant = ("c:" if compact else "") + ",".join(fields)
+    key, cached = get_history_payload(emp_id, period, start, variant)
+    if cached is None:
+        content, last_modified = history_payload(emp_id, period, start, end, fields, compact)
+        cached = (quote_etag(hashlib.md5(content).hexdigest()), last_modified, content)
+        set_history_payload(key, *cached)
+    etag, last_modified, content = cached
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(content, content_type="application/json")
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# nhân viên giống nhau ở mọi punch nên dạng compact đưa lên đầu payload
+HISTORY_COMPACT_FIELDS = [f for f in ATTENDANCE_ITEM_FIELDS if f not in ("employee", "employee_username")]
+
+
+def history_payload(emp_id, period, start, end, fields, compact=False):
+    """(JSON lịch sử đã render, mốc sửa đổi cuối cùng dạng timestamp hoặc None)."""
+    ts_i, loc_i = ATTENDANCE_ITEM_COLUMNS.index("timestamp"), ATTENDANCE_ITEM_COLUMNS.index("work_location_id")
+    # punch được xếp vào ngày công theo lịch ca: ca qua đêm có punch ở ngày địa phương liền trước/sau kỳ
+    lo, hi = start - timedelta(days=1), end + timedelta(days=1)
+    roster = load_roster(start - timedelta(days=2), end + timedelta(days=2), [emp_id])
+    rows = list(Attendance.objects.filter(employee_id=emp_id, work_date__gte=lo, work_date__lte=hi)
+                .order_by("timestamp").values_list(*ATTENDANCE_ITEM_COLUMNS, "work_date", "changed_at"))
+    if archived_months(lo, hi):
+        # tháng đã chuyển sang file lưu trữ: đọc qua mmap rồi đưa về cùng dạng tuple
+        cold = archived_attendances(emp_id, lo, hi)
+        if cold:
+            username = Employee.objects.filter(id=emp_id).values_list("user__username", flat=True).first()
+            rows = sorted(rows + [
+                (a.id, emp_id, username, a.timestamp, a.type, a.latitude, a.longitude, a.distance_m,
+                 a.within_geofence, a.work_location_id, a.note, a.work_date, a.changed_at)
+                for a in cold
+            ], key=lambda r: r[ts_i])
     # Build grouped list
     days = {}
-    for a in qs:
-        d = a.timestamp.date()
-        days.setdefault(d, []).append(a)
+    for r in rows:
+        day = roster.work_date(emp_id, r[ts_i])
+        if start <= day <= end:
+            days.setdefault(day, []).append(r)
+    rows = [r for items in days.values() for r in items]
 
+    locations = geofence_index()
     results = []
     total_hours_all = 0.0
-    late = False
-    early_leave = False
-
-    shift = emp.shift
-    for d, items in sorted(days.items()):
-        # Compute total hours from in/out pairs
-        total_hours = 0.0
-        ins = [x for x in items if x.type=="IN"]
-        outs = [x for x in items if x.type=="OUT"]
-        paired = []
-        # naive pairing: by order
-        i = 0; j = 0
-        while i < len(ins) and j < len(outs):
-            if ins[i].timestamp <= outs[j].timestamp:
-                duration = (outs[j].timestamp - ins[i].timestamp).total_seconds()/3600.0
-                total_hours += max(0.0, duration)
-                paired.append((ins[i], outs[j]))
-                i += 1; j += 1
-            else:
-                j += 1
-        total_hours_all += total_hours
-
-        # Late / early detection
-        if shift:
-            # localize shift start/end to this date
-            st = timezone.make_aware(datetime.combine(d, shift.start_time))
-            en = timezone.make_aware(datetime.combine(d, shift.end_time))
-            grace_in = timedelta(minutes=shift.late_grace_min)
-            grace_out = timedelta(minutes=shift.early_grace_min)
-            first_in = ins[0].timestamp if ins else None
-            last_out = outs[-1].timestamp if outs else None
-            if first_in and first_in > st + grace_in:
-                late = True
-            if last_out and last_out < en - grace_out:
-                early_leave = True
-
+    summaries = list(DailyWorkSummary.objects.filter(employee_id=emp_id, work_date__gte=start, work_date__lte=end).order_by("work_date"))
+    for summary in summaries:
+        total_hours_all += summary.worked_hours
         results.append({
-            "date": d, 
-            "items": AttendanceSerializer(items, many=True).data,
-            "total_hours": round(total_hours, 2),
-            "late": late,
-            "early_leave": early_leave,
+            "date": summary.work_date,
+            "items": attendance_items(days.get(summary.work_date, []), fields, locations, compact),
+            "total_hours": round(summary.worked_hours, 2),
+            "late": summary.late,
+            "early_leave": summary.early_leave,
         })
 
-    return Response({
+    payload = {
         "period": period,
         "start": start, "end": end,
         "days": results,
         "sum_hours": round(total_hours_all,2)
-    })
+    }
+    if compact:
+        payload["employee"] = emp_id
+        payload["fields"] = fields
+        if "work_location" in fields:
+            payload["locations"] = {loc_id: location_data(locations.get(loc_id)) for loc_id in {r[loc_i] for r in rows}}
+    changed = [s.updated_at for s in summaries] + [r[-1] or r[ts_i] for r in rows]
+    return JSONRenderer().render(payload), int(max(changed).timestamp()) if changed else None
 
 # ---------------- Web UI -----------------
 
@@ -230,43 +467,20 @@ def web_dashboard(request):
         start, end = base, base
 
     total_emp = Employee.objects.filter(is_active=True).count()
+    ins = Attendance.objects.filter(work_date__gte=start, work_date__lte=end, type="IN")
     # present: anyone with IN within the period
-    present_ids = set(Attendance.objects.filter(type="IN", timestamp__date__gte=start, timestamp__date__lte=end).values_list("employee_id", flat=True))
-    present = len(present_ids)
+    present = ins.values("employee_id").distinct().count()
     absent = max(0, total_emp - present)
-    # late: IN after shift.start + grace
-    late_count = 0
-    for emp in Employee.objects.filter(is_active=True, shift__isnull=False):
-        ins = Attendance.objects.filter(employee=emp, type="IN", timestamp__date__gte=start, timestamp__date__lte=end).order_by("timestamp")
-        if ins.exists():
-            # check the earliest check-in
-            d = ins.first().timestamp.date()
-            st = timezone.make_aware(datetime.combine(d, emp.shift.start_time))
-            if ins.first().timestamp > st + timedelta(minutes=emp.shift.late_grace_min):
-                late_count += 1
+    # late: employees late at least once in the period (late is evaluated against the roster when summarizing)
+    late_count = (DailyWorkSummary.objects.filter(work_date__gte=start, work_date__lte=end, late=True, employee__is_active=True)
+                  .values("employee_id").distinct().count())
 
     # Overtime: hours > 8 per day (simple)
-    daily_hours = []
-    days = Attendance.objects.filter(timestamp__date__gte=start, timestamp__date__lte=end).dates("timestamp", "day")
-    for d in days:
-        items = Attendance.objects.filter(timestamp__date=d).order_by("timestamp")
-        # group by employee
-        hours = 0.0
-        emps = Employee.objects.all()
-        for emp in emps:
-            emp_items = items.filter(employee=emp)
-            ins = list(emp_items.filter(type="IN"))
-            outs = list(emp_items.filter(type="OUT"))
-            i = 0; j = 0
-            emp_hours = 0.0
-            while i < len(ins) and j < len(outs):
-                if ins[i].timestamp <= outs[j].timestamp:
-                    emp_hours += max(0.0, (outs[j].timestamp - ins[i].timestamp).total_seconds()/3600.0)
-                    i += 1; j += 1
-                else:
-                    j += 1
-            hours += emp_hours
-        daily_hours.append((d, hours))
+    daily_hours = list(
+        DailyWorkSummary.objects.filter(work_date__gte=start, work_date__lte=end)
+        .values("work_date").annotate(hours=Sum("worked_hours")).order_by("work_date")
+        .values_list("work_date", "hours")
+    )
 
     context = {
         "total_emp": total_emp,
@@ -282,8 +496,68 @@ def web_dashboard(request):
 @login_required
 def web_monitor(request):
     # latest 100 records
-    recs = Attendance.objects.select_related("employee","work_location").order_by("-timestamp")[:100]
-    return render(request, "attendance/monitor.html", {"records": recs})
+    recs = Attendance.objects.select_related("employee__user","work_location").order_by("-timestamp", "-id")[:100]
+    return render(request, "attendance/monitor.html", {"records": recs, "version": monitor_version()})
+
+MONITOR_FEED_LIMIT = 100
+MONITOR_FEED_MAX_LIMIT = 500
+MONITOR_MAX_WAIT = 25          # giây, long-poll
+MONITOR_POLL_INTERVAL = 0.5
+MONITOR_FIELDS = ("id", "timestamp", "employee", "type", "work_location", "latitude", "longitude", "distance_m", "within_geofence")
+
+@gzip_page
+@login_required
+def web_monitor_feed(request):
+    """JSON feed for the monitor page, keyset-paginated on (timestamp, id).
+
+    ?before_id=N -> older page; ?after_id=N -> punches newer than N (oldest first).
+    With after_id, ?v=<version> lets an idle poll return without touching the DB and
+    ?wait=S long-polls up to S seconds until a new punch arrives. ?fields=a,b keeps only these record fields.
+    """
+    try:
+        limit = min(int(request.GET.get("limit", MONITOR_FEED_LIMIT)), MONITOR_FEED_MAX_LIMIT)
+        before_id = int(request.GET["before_id"]) if request.GET.get("before_id") else None
+        after_id = int(request.GET["after_id"]) if request.GET.get("after_id") else None
+        wait = min(float(request.GET.get("wait", 0)), MONITOR_MAX_WAIT)
+        fields = parse_fields(request.GET.get("fields"), MONITOR_FIELDS)
+    except ValueError:
+        return JsonResponse({"ok": False, "message": "Tham số không hợp lệ."}, status=400)
+    seen = request.GET.get("v")
+
+    version = monitor_version()
+    if after_id is not None and seen is not None:
+        deadline = _time.monotonic() + wait
+        while str(version) == seen and _time.monotonic() < deadline:
+            _time.sleep(MONITOR_POLL_INTERVAL)
+            version = monitor_version()
+        if str(version) == seen:
+            return JsonResponse({"ok": True, "version": version, "records": []})
+
+    qs = Attendance.objects.all()
+    if after_id is not None:
+        cursor_ts = Attendance.objects.filter(pk=after_id).values("timestamp")[:1]
+        qs = qs.filter(Q(timestamp__gt=Subquery(cursor_ts)) | Q(timestamp=Subquery(cursor_ts), id__gt=after_id)).order_by("timestamp", "id")
+    else:
+        if before_id is not None:
+            cursor_ts = Attendance.objects.filter(pk=before_id).values("timestamp")[:1]
+            qs = qs.filter(Q(timestamp__lt=Subquery(cursor_ts)) | Q(timestamp=Subquery(cursor_ts), id__lt=before_id))
+        qs = qs.order_by("-timestamp", "-id")
+    rows = qs.values(
+        "id", "timestamp", "type", "latitude", "longitude", "distance_m", "within_geofence",
+        "employee__user__username", "work_location__name",
+    )[:limit]
+    records = [{
+        "id": r["id"],
+        "timestamp": timezone.localtime(r["timestamp"]).isoformat(),
+        "employee": r["employee__user__username"],
+        "type": r["type"],
+        "work_location": r["work_location__name"],
+        "latitude": r["latitude"], "longitude": r["longitude"],
+        "distance_m": r["distance_m"], "within_geofence": r["within_geofence"],
+    } for r in rows]
+    if len(fields) < len(MONITOR_FIELDS):
+        records = [{f: rec[f] for f in fields} for rec in records]
+    return JsonResponse({"ok": True, "version": version, "records": records})
 
 @login_required
 @require_roles('Quản trị viên','Nhân sự')
@@ -323,6 +597,30 @@ def web_employees(request):
         "employees": employees, "roles": roles, "shifts": shifts, "locations": locations, "departments": departments, "positions": positions
     })
 
+# số lỗi tối đa hiển thị sau một lần import
+IMPORT_ERRORS_SHOWN = 200
+
+
+@login_required
+@require_roles('Quản trị viên','Nhân sự')
+def web_employee_import(request):
+    ctx = {"columns": IMPORT_COLUMNS}
+    if request.method == "POST":
+        upload = request.FILES.get("file")
+        if not upload:
+            ctx["error"] = "Chưa chọn file."
+        else:
+            try:
+                created, errors = import_employees(upload, upload.name)
+            except ImportFileError as e:
+                ctx["error"] = str(e)
+            else:
+                ctx.update({
+                    "message": f"Đã tạo {created} nhân viên, {len(errors)} dòng lỗi.",
+                    "errors": errors[:IMPORT_ERRORS_SHOWN], "errors_hidden": max(0, len(errors) - IMPORT_ERRORS_SHOWN),
+                })
+    return render(request, "attendance/hr_import.html", ctx)
+
 @login_required
 def web_employee_new(request):
     return redirect("web_employees")
@@ -371,6 +669,52 @@ def web_employee_reset_password(request, pk):
     emp.user.save()
     return redirect("web_employees")
 
+def _bulk_choice(value):
+    # "" = giữ nguyên, "none" = bỏ trống, còn lại là id
+    if value in (None, ""):
+        return UNCHANGED
+    return None if value == "none" else int(value)
+
+
+@login_required
+@require_roles('Quản trị viên','Nhân sự')
+def web_employee_bulk(request):
+    """Thao tác hàng loạt: chọn nhân viên theo employee_ids và/hoặc phòng ban/chức vụ, trả JSON."""
+    if request.method != "POST":
+        return JsonResponse({"ok": False, "message": "Chỉ hỗ trợ POST."}, status=405)
+    p = request.POST
+    try:
+        ids = [int(i) for i in p.getlist("employee_ids") if i]
+        dept_id = int(p["department_id"]) if p.get("department_id") else None
+        pos_id = int(p["position_id"]) if p.get("position_id") else None
+        shift_id = _bulk_choice(p.get("shift_id"))
+        role_id = _bulk_choice(p.get("role_id"))
+        location_ids = [int(i) for i in p.getlist("location_ids") if i]
+    except ValueError:
+        return JsonResponse({"ok": False, "message": "Tham số không hợp lệ."}, status=400)
+    if not (ids or dept_id or pos_id):
+        return JsonResponse({"ok": False, "message": "Chưa chọn nhân viên hoặc phòng ban/chức vụ."}, status=400)
+    is_active = {"1": True, "0": False}.get(p.get("is_active"))
+    location_mode = p.get("location_mode") if p.get("location_mode") in ("add", "remove", "set") else None
+
+    emp_ids = list(select_employees(ids, dept_id, pos_id).values_list("id", flat=True))
+    try:
+        updated = bulk_update_employees(emp_ids, shift_id=shift_id, role_id=role_id, is_active=is_active,
+                                        location_mode=location_mode, location_ids=location_ids)
+    except ValueError as e:
+        return JsonResponse({"ok": False, "message": str(e)}, status=400)
+    job_id = start_password_reset(emp_ids) if p.get("reset_password") == "1" and emp_ids else None
+    return JsonResponse({"ok": True, "updated": updated, "job_id": job_id})
+
+
+@login_required
+@require_roles('Quản trị viên','Nhân sự')
+def web_employee_bulk_job(request, job_id):
+    progress = job_progress(job_id)
+    if progress is None:
+        raise Http404
+    return JsonResponse({"ok": True, **progress})
+
 @login_required
 @require_roles('Quản trị viên','Nhân sự')
 def web_shifts(request):
@@ -409,9 +753,13 @@ def web_locations(request):
         }
         if lid:
             loc = get_object_or_404(WorkLocation, pk=lid)
+            moved = (loc.latitude, loc.longitude, loc.radius_m) != (data["latitude"], data["longitude"], data["radius_m"])
             for k,v in data.items():
                 setattr(loc, k, v)
             loc.save()
+            if moved:
+                # distance_m/within_geofence của các punch đã lưu được tính lại ở nền
+                start_reevaluation(loc.pk)
         else:
             WorkLocation.objects.create(**data)
         return redirect("web_locations")
@@ -423,7 +771,8 @@ def web_locations(request):
 def web_attendance_edit(request, pk):
     a = get_object_or_404(Attendance, pk=pk)
     if request.method == "POST":
-        before = AttendanceSerializer(a).data
+        before = AttendanceChangeLog.snapshot(a)
+        old_day = a.work_date
         a.type = request.POST.get("type", a.type)
         a.timestamp = timezone.make_aware(datetime.strptime(request.POST.get("timestamp"), "%Y-%m-%d %H:%M"))
         a.latitude = float(request.POST.get("latitude"))
@@ -432,8 +781,16 @@ def web_attendance_edit(request, pk):
         a.note = request.POST.get("note","")
         a.changed_by = request.user
         a.changed_at = timezone.now()
-        a.save()
-        AttendanceChangeLog.objects.create(attendance=a, action="edited", reason=request.POST.get("reason",""), before_data=before, after_data=AttendanceSerializer(a).data, changed_by=request.user)
+        with transaction.atomic():
+            a.save()
+            AttendanceChangeLog.objects.create(attendance=a, action="edited", reason=request.POST.get("reason",""),
+                                               changes=AttendanceChangeLog.diff(before, AttendanceChangeLog.snapshot(a)),
+                                               changed_by=request.user, changed_at=a.changed_at)
+        if a.employee:
+            invalidate_clock_state(a.employee_id)
+            refresh_daily_summary(a.employee, old_day)
+            if a.work_date != old_day:
+                refresh_daily_summary(a.employee, a.work_date)
         return redirect("web_monitor")
     locations = WorkLocation.objects.all()
     return render(request, "attendance/attendance_edit.html", {"a": a, "locations": locations})
@@ -444,98 +801,182 @@ def web_attendance_new(request):
     if request.method == "POST":
         emp_id = int(request.POST.get("employee_id"))
         emp = get_object_or_404(Employee, pk=emp_id)
-        a = Attendance.objects.create(
-            employee=emp,
-            type=request.POST.get("type","IN"),
-            timestamp=timezone.make_aware(datetime.strptime(request.POST.get("timestamp"), "%Y-%m-%d %H:%M")),
-            latitude=float(request.POST.get("latitude")),
-            longitude=float(request.POST.get("longitude")),
-            work_location_id=int(request.POST.get("work_location_id")),
-            note=request.POST.get("note",""),
-            created_by=request.user
-        )
-        AttendanceChangeLog.objects.create(attendance=a, action="created", reason=request.POST.get("reason",""), after_data=AttendanceSerializer(a).data, changed_by=request.user)
+        with transaction.atomic():
+            a = Attendance.objects.create(
+                employee=emp,
+                type=request.POST.get("type","IN"),
+                timestamp=timezone.make_aware(datetime.strptime(request.POST.get("timestamp"), "%Y-%m-%d %H:%M")),
+                latitude=float(request.POST.get("latitude")),
+                longitude=float(request.POST.get("longitude")),
+                work_location_id=int(request.POST.get("work_location_id")),
+                note=request.POST.get("note",""),
+                created_by=request.user
+            )
+            # giá trị ban đầu chính là bản ghi; các lần sửa sau lưu giá trị cũ trong changes
+            AttendanceChangeLog.objects.create(attendance=a, action="created", reason=request.POST.get("reason",""), changed_by=request.user)
+        invalidate_clock_state(emp.id)
+        refresh_daily_summary(emp, a.work_date)
         return redirect("web_monitor")
     employees = Employee.objects.select_related("user").all()
     locations = WorkLocation.objects.all()
     return render(request, "attendance/attendance_new.html", {"employees": employees, "locations": locations})
 
+AUDIT_PAGE_SIZE = 100
+
+
 @login_required
-@require_roles('Quản trị viên','Nhân sự','Trưởng phòng')
-def web_monthly(request):
-    # show monthly summary table
+@require_roles('Quản trị viên','Nhân sự')
+def web_attendance_audit(request):
+    """Nhật ký sửa công, lọc theo người sửa và/hoặc bản ghi, theo tháng; mới nhất trước."""
+    month = request.GET.get("month") or timezone.localdate().strftime("%Y-%m")
+    try:
+        start = datetime.strptime(month, "%Y-%m").date()
+        changed_by = int(request.GET["changed_by"]) if request.GET.get("changed_by") else None
+        attendance_id = int(request.GET["attendance"]) if request.GET.get("attendance") else None
+        before_id = int(request.GET["before_id"]) if request.GET.get("before_id") else None
+    except ValueError:
+        return HttpResponse("Tham số không hợp lệ.", status=400)
+    end = month_bounds(start)[1]
+    logs = AttendanceChangeLog.objects.all()
+    if attendance_id:
+        logs = logs.filter(attendance_id=attendance_id)
+    else:
+        logs = logs.filter(changed_at__gte=timezone.make_aware(datetime.combine(start, time.min)),
+                           changed_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+    if changed_by:
+        logs = logs.filter(changed_by_id=changed_by)
+    if before_id:
+        # trang sau: cùng thứ tự (changed_at, id) giảm dần
+        cursor = AttendanceChangeLog.objects.filter(id=before_id).values("changed_at")
+        logs = logs.filter(Q(changed_at__lt=Subquery(cursor)) | Q(changed_at=Subquery(cursor), id__lt=before_id))
+    logs = list(logs.select_related("changed_by", "attendance__employee__user")
+                .order_by("-changed_at", "-id")[:AUDIT_PAGE_SIZE + 1])
+    more = len(logs) > AUDIT_PAGE_SIZE
+    logs = logs[:AUDIT_PAGE_SIZE]
+    editors = User.objects.filter(Q(is_superuser=True) | Q(employee__role__name__in=["Quản trị viên","Nhân sự","Trưởng phòng"])).order_by("username")
+    return render(request, "attendance/audit.html", {
+        "logs": logs, "month": month, "changed_by": changed_by, "attendance_id": attendance_id,
+        "editors": editors, "next_before_id": logs[-1].id if more else None,
+    })
+
+MONTHLY_PAGE_SIZE = 50
+MONTHLY_MAX_PAGE_SIZE = 200
+
+
+def _monthly_params(request):
+    """(tháng, phòng ban, chức vụ) từ query string; ValueError nếu sai định dạng."""
     month = request.GET.get("month")  # 'YYYY-MM'
-    if month:
-        y, m = [int(x) for x in month.split("-")]
-        d = date(y, m, 1)
+    d = datetime.strptime(month, "%Y-%m").date() if month else timezone.localdate().replace(day=1)
+    department_id = int(request.GET["department"]) if request.GET.get("department") else None
+    position_id = int(request.GET["position"]) if request.GET.get("position") else None
+    return d, department_id, position_id
+
+
+def _monthly_employees(department_id=None, position_id=None):
+    employees = Employee.objects.filter(is_active=True)
+    if department_id:
+        employees = employees.filter(department_id=department_id)
+    if position_id:
+        employees = employees.filter(position_id=position_id)
+    return employees
+
+
+def monthly_page(d, department_id=None, position_id=None, after_id=None, limit=MONTHLY_PAGE_SIZE):
+    """Một trang bảng công: ([{id, username, full_name, daily, total}], id để tải trang sau hoặc None, snapshot hoặc None).
+
+    Chỉ đọc giờ công của nhân viên trong trang (một truy vấn tổng hợp ngày), hoặc tra snapshot nếu tháng đã chốt.
+    """
+    start, end = month_bounds(d)
+    days = [(start + timedelta(days=i)) for i in range((end - start).days + 1)]
+    employees = _monthly_employees(department_id, position_id)
+    if after_id:
+        employees = employees.filter(id__gt=after_id)
+    ids = list(employees.order_by("id").values_list("id", flat=True)[:limit + 1])
+    more = len(ids) > limit
+    ids = ids[:limit]
+    page = Employee.objects.filter(id__in=ids)
+    # tháng đã kết thúc đọc từ bảng công đã chốt, tháng hiện tại tính từ bảng tổng hợp ngày
+    snapshot = month_snapshot(d) if ids else None
+    if snapshot:
+        by_username = snapshot_by_username(snapshot)
+        empty = [0.0] * (len(days) + 1)
+        rows = [(emp_id, by_username.get(username) or [username, f"{first} {last}".strip()] + empty)
+                for emp_id, username, first, last in page.order_by("id").values_list(
+                    "id", "user__username", "user__first_name", "user__last_name")]
     else:
-        d = timezone.localdate().replace(day=1)
-    start, end = d.replace(day=1), month_bounds(d)[1]
-    employees = Employee.objects.filter(is_active=True).select_related("user","shift")
-    # build table: employee -> day -> hours
+        rows = iter_employee_rows(start, end, days, page)
+    table = [{"id": emp_id, "username": r[0], "full_name": r[1], "daily": r[2:-1], "total": r[-1]} for emp_id, r in rows]
+    return table, (ids[-1] if more else None), snapshot
+
+
+@login_required
+@require_roles('Quản trị viên','Nhân sự','Trưởng phòng')
+def web_monthly(request):
+    # trang đầu render sẵn, các trang sau tải qua web_monthly_rows khi cuộn tới cuối bảng
+    try:
+        d, department_id, position_id = _monthly_params(request)
+    except ValueError:
+        return HttpResponse("Tham số không hợp lệ.", status=400)
+    start, end = month_bounds(d)
     days = [(start + timedelta(days=i)) for i in range((end - start).days + 1)]
-    table = []
-    for emp in employees:
-        row = {"employee": emp, "daily": [], "total": 0.0}
-        for day in days:
-            items = Attendance.objects.filter(employee=emp, timestamp__date=day).order_by("timestamp")
-            ins = list(items.filter(type="IN"))
-            outs = list(items.filter(type="OUT"))
-            i=j=0; hours=0.0
-            while i < len(ins) and j < len(outs):
-                if ins[i].timestamp <= outs[j].timestamp:
-                    hours += (outs[j].timestamp - ins[i].timestamp).total_seconds()/3600.0
-                    i+=1; j+=1
-                else:
-                    j+=1
-            row["daily"].append(round(hours,2))
-            row["total"] += hours
-        row["total"] = round(row["total"],2)
-        table.append(row)
-    return render(request, "attendance/monthly.html", {"days": days, "table": table, "month": d.strftime("%Y-%m")})
+    table, next_after, snapshot = monthly_page(d, department_id, position_id)
+    return render(request, "attendance/monthly.html", {
+        "days": days, "table": table, "month": d.strftime("%Y-%m"), "next_after": next_after, "snapshot": snapshot,
+        "department_id": department_id, "position_id": position_id,
+        "departments": Department.objects.order_by("name"), "positions": Position.objects.select_related("department").order_by("name"),
+    })
+
 
 @login_required
 @require_roles('Quản trị viên','Nhân sự','Trưởng phòng')
-def web_monthly_export(request):
-    month = request.GET.get("month")  # 'YYYY-MM'
-    if month:
-        y, m = [int(x) for x in month.split("-")]
-        d = date(y, m, 1)
-    else:
-        d = timezone.localdate().replace(day=1)
-    start, end = d.replace(day=1), month_bounds(d)[1]
-    employees = Employee.objects.filter(is_active=True).select_related("user","shift")
+def web_monthly_rows(request):
+    """JSON một trang bảng công: ?month=&department=&position=&after_id=&limit="""
+    try:
+        d, department_id, position_id = _monthly_params(request)
+        after_id = int(request.GET["after_id"]) if request.GET.get("after_id") else None
+        limit = min(int(request.GET.get("limit", MONTHLY_PAGE_SIZE)), MONTHLY_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({"ok": False, "message": "Tham số không hợp lệ."}, status=400)
+    table, next_after, _ = monthly_page(d, department_id, position_id, after_id, limit)
+    return JsonResponse({"ok": True, "rows": table, "next_after": next_after})
+
 
-    # Build CSV (Excel friendly)
+@login_required
+@require_roles('Quản trị viên','Nhân sự','Trưởng phòng')
+def web_monthly_export(request):
+    try:
+        d, department_id, position_id = _monthly_params(request)
+    except ValueError:
+        return HttpResponse("Tham số không hợp lệ.", status=400)
+    start, end = month_bounds(d)
     days = [(start + timedelta(days=i)) for i in range((end - start).days + 1)]
-    output = io.StringIO()
-    writer = csv.writer(output)
     header = ["Username", "Họ tên"] + [x.strftime("%d/%m") for x in days] + ["Tổng giờ"]
-    writer.writerow(header)
-
-    for emp in employees:
-        row = [emp.user.username, emp.user.get_full_name()]
-        total = 0.0
-        for day in days:
-            items = Attendance.objects.filter(employee=emp, timestamp__date=day).order_by("timestamp")
-            ins = list(items.filter(type="IN"))
-            outs = list(items.filter(type="OUT"))
-            i=j=0; hours=0.0
-            while i < len(ins) and j < len(outs):
-                if ins[i].timestamp <= outs[j].timestamp:
-                    hours += (outs[j].timestamp - ins[i].timestamp).total_seconds()/3600.0
-                    i+=1; j+=1
-                else:
-                    j+=1
-            row.append(round(hours,2))
-            total += hours
-        row.append(round(total,2))
-        writer.writerow(row)
-
-    resp = HttpResponse(output.getvalue(), content_type="text/csv")
+    employees = _monthly_employees(department_id, position_id) if department_id or position_id else None
+    snapshot = month_snapshot(d)
+    if snapshot:
+        body = snapshot_rows(snapshot)
+        if employees is not None:
+            usernames = set(employees.values_list("user__username", flat=True))
+            body = [r for r in body if r[0] in usernames]
+    else:
+        body = (r for _, r in iter_employee_rows(start, end, days, employees))
+    rows = itertools.chain([header], body)
+
+    # Stream rows while reading (proxy won't time out on large headcounts)
+    if request.GET.get("format") == "xlsx":
+        resp = StreamingHttpResponse(iter_xlsx(rows, sheet_name=f"{d:%m-%Y}"), content_type=XLSX_CONTENT_TYPE)
+        resp['Content-Disposition'] = f'attachment; filename="bang_cong_{d:%Y_%m}.xlsx"'
+        return resp
+    writer = csv.writer(_Echo())
+    resp = StreamingHttpResponse((writer.writerow(row) for row in rows), content_type="text/csv")
     resp['Content-Disposition'] = f'attachment; filename="bang_cong_{d:%Y_%m}.csv"'
     return resp
 
+class _Echo:
+    # pseudo-buffer for csv.writer: writerow() returns the formatted line
+    def write(self, value):
+        return value
+
 
 
 from django.contrib.auth import login as auth_login, logout as auth_logout
@@ -0,0 +1,174 @@
+# Ghi/đọc file .xlsx dạng luồng, bộ nhớ cố định (không cần thư viện ngoài). Khi ghi, mỗi dòng được
+# ghi thẳng vào sheet1.xml trong file zip và byte nén được trả ra ngay cho StreamingHttpResponse.
+import zipfile
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+# trả dữ liệu ra khi bộ đệm vượt ngưỡng này (byte)
+FLUSH_BYTES = 64 * 1024
+
+
+class _Sink:
+    """Đích ghi không seek được cho ZipFile; giữ các byte nén cho tới khi được lấy ra."""
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+def column_letter(idx):
+    """0 -> A, 25 -> Z, 26 -> AA ..."""
+    letters = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _cell(ref, value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+
+def iter_xlsx(rows, sheet_name="Sheet1"):
+    """Sinh các khối byte của một file .xlsx một sheet từ iterable các dòng (list giá trị)."""
+    sink = _Sink()
+    letters = []
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK.format(name=escape(sheet_name[:31], {'"': "&quot;"})))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(_SHEET_HEAD.encode())
+            for r, row in enumerate(rows, 1):
+                while len(letters) < len(row):
+                    letters.append(column_letter(len(letters)))
+                cells = "".join(_cell(f"{letters[c]}{r}", v) for c, v in enumerate(row))
+                sheet.write(f'<row r="{r}">{cells}</row>'.encode())
+                if sink.size >= FLUSH_BYTES:
+                    yield sink.drain()
+            sheet.write(_SHEET_TAIL.encode())
+    yield sink.drain()
+
+
+# ---------------- Đọc -----------------
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+
+def _column_index(ref):
+    idx = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        idx = idx * 26 + (ord(ch.upper()) - 64)
+    return idx - 1
+
+
+def _text(elem):
+    # <si>/<is> có thể chia thành nhiều <r><t>; ghép toàn bộ <t> con
+    return "".join(t.text or "" for t in elem.iter(_NS + "t"))
+
+
+def _first_sheet_path(zf):
+    workbook = ElementTree.fromstring(zf.read("xl/workbook.xml"))
+    sheet = workbook.find(f"{_NS}sheets/{_NS}sheet")
+    rel_id = sheet.get(_REL_NS + "id") if sheet is not None else None
+    if rel_id and "xl/_rels/workbook.xml.rels" in zf.namelist():
+        for rel in ElementTree.fromstring(zf.read("xl/_rels/workbook.xml.rels")):
+            if rel.get("Id") == rel_id:
+                target = rel.get("Target").lstrip("/")
+                return target if target.startswith("xl/") else "xl/" + target
+    return "xl/worksheets/sheet1.xml"
+
+
+def iter_xlsx_rows(fileobj):
+    """Đọc dần sheet đầu tiên của file .xlsx, sinh từng dòng dạng list chuỗi (ô trống là "").
+
+    Sheet được phân tích bằng iterparse và giải phóng từng dòng, nên bộ nhớ chỉ phụ thuộc
+    bảng chuỗi dùng chung (sharedStrings), không phụ thuộc số dòng. zipfile.BadZipFile nếu
+    không phải file .xlsx.
+    """
+    with zipfile.ZipFile(fileobj) as zf:
+        shared = []
+        if "xl/sharedStrings.xml" in zf.namelist():
+            with zf.open("xl/sharedStrings.xml") as f:
+                for _, elem in ElementTree.iterparse(f):
+                    if elem.tag == _NS + "si":
+                        shared.append(_text(elem))
+                        elem.clear()
+        with zf.open(_first_sheet_path(zf)) as f:
+            for _, elem in ElementTree.iterparse(f):
+                if elem.tag != _NS + "row":
+                    continue
+                row = []
+                for c in elem.iter(_NS + "c"):
+                    idx = _column_index(c.get("r", "")) if c.get("r") else len(row)
+                    kind = c.get("t")
+                    if kind == "inlineStr":
+                        value = _text(c)
+                    else:
+                        v = c.find(_NS + "v")
+                        value = v.text if v is not None and v.text is not None else ""
+                        if kind == "s" and value:
+                            value = shared[int(value)]
+                    row.extend([""] * (idx - len(row)))
+                    row.append(value)
+                elem.clear()
+                yield row
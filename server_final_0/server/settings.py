@@ -15,7 +15,6 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    'django.contrib.postgres',
     "rest_framework",
     "rest_framework_simplejwt",
     "corsheaders",
@@ -23,6 +22,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "attendance.metrics.MetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -60,6 +60,41 @@ DATABASES = {
     }
 }
 
+# Cache phải dùng chung giữa các worker và lệnh manage.py (signal xóa cache ở tiến trình ghi, xem
+# attendance/checks.py): mặc định là thư mục trên đĩa của máy chủ; đặt REDIS_URL (cần gói django-redis)
+# khi chạy nhiều máy hoặc cần nhanh hơn
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("ATTENDANCE_CACHE_DIR", str(BASE_DIR / "cache")),
+            "OPTIONS": {"MAX_ENTRIES": 100000},
+        }
+    }
+
+# Ghi chấm công theo lô cho giờ cao điểm (xem attendance/ingest.py)
+ATTENDANCE_GROUP_COMMIT = os.environ.get("ATTENDANCE_GROUP_COMMIT") == "1"
+ATTENDANCE_GROUP_COMMIT_INTERVAL_MS = int(os.environ.get("ATTENDANCE_GROUP_COMMIT_INTERVAL_MS", "50"))
+ATTENDANCE_GROUP_COMMIT_MAX_ROWS = int(os.environ.get("ATTENDANCE_GROUP_COMMIT_MAX_ROWS", "500"))
+ATTENDANCE_JOURNAL_DIR = os.environ.get("ATTENDANCE_JOURNAL_DIR", str(BASE_DIR / "journal"))
+
+# Đồng bộ offline (/api/clock/batch/): punch cũ hơn số ngày này bị từ chối
+ATTENDANCE_OFFLINE_MAX_AGE_DAYS = int(os.environ.get("ATTENDANCE_OFFLINE_MAX_AGE_DAYS", "7"))
+
+# Lưu trữ lạnh các tháng chấm công cũ (xem attendance/archive.py)
+ATTENDANCE_ARCHIVE_DIR = os.environ.get("ATTENDANCE_ARCHIVE_DIR", str(BASE_DIR / "archive"))
+ATTENDANCE_HOT_MONTHS = int(os.environ.get("ATTENDANCE_HOT_MONTHS", "3"))
+
+# /metrics: chỉ trả cho các IP này (Prometheus) hoặc tài khoản staff đã đăng nhập
+METRICS_ALLOWED_IPS = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+
 AUTH_PASSWORD_VALIDATORS = []
 
 LANGUAGE_CODE = "vi"
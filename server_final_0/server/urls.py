@@ -3,11 +3,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import RedirectView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from attendance.serializers import EmployeeTokenObtainPairSerializer, EmployeeTokenRefreshSerializer
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', RedirectView.as_view(url='/web/dashboard/', permanent=False)),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/', TokenObtainPairView.as_view(serializer_class=EmployeeTokenObtainPairSerializer), name='token_obtain_pair'),
+    path('api/token/refresh/', TokenRefreshView.as_view(serializer_class=EmployeeTokenRefreshSerializer), name='token_refresh'),
     path('', include('attendance.urls')),
 ]